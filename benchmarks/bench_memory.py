@@ -0,0 +1,138 @@
+"""Mémoire par ville : ancien modèle d'entités et modèle actuel.
+
+Usage : python benchmarks/bench_memory.py [--cities 100 500] [--json]
+
+- legacy : les anciennes entités (un dictionnaire "HH:MM" du mois par
+  capteur, rechargé à chaque update) reproduites sans Home Assistant ;
+- current : async_setup_platform dans une instance Home Assistant réelle, comme dans
+  bench_setup.py, soit les tableaux d'entiers partagés, un coordinateur et
+  des entités par ville.
+
+La mémoire est celle encore allouée (tracemalloc) une fois le chargement
+terminé, divisée par le nombre de villes.
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bench_setup import generate_tree, run_setup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.prayer_times import loader  # noqa: E402
+
+
+# --- Ancien modèle, reproduit tel quel pour comparaison -----------------------
+
+def _read_month(base_path, city, month):
+    prayer_times = {}
+    with open(os.path.join(base_path, city, f"{month:02}.csv"), "r") as file:
+        for row in csv.DictReader(file):
+            prayer_times[row["date"]] = {
+                prayer: row[prayer] for prayer in ("Fajr", "Shurouq", "Dhuhr", "Asr", "Maghrib", "Isha")
+            }
+    return prayer_times
+
+
+class LegacyPrayerTimeSensor:
+    def __init__(self, base_path, city, prayer):
+        self.base_path = base_path
+        self.city = city
+        self.prayer = prayer
+        self.time = None
+        self._state = None
+
+    def update(self):
+        self.time = _read_month(self.base_path, self.city, datetime.now().month)
+        self._state = self.time.get(datetime.now().strftime("%m-%d"), {}).get(self.prayer)
+
+
+class LegacyIqamaTimeSensor:
+    def __init__(self, base_path, city, prayer, iqama_delay):
+        self.base_path = base_path
+        self.city = city
+        self.prayer = prayer
+        self.iqama_delay = iqama_delay
+        self._state = None
+        self.base_time = None
+
+    def update(self):
+        self.base_time = _read_month(self.base_path, self.city, datetime.now().month)
+        prayer_time = self.base_time.get(datetime.now().strftime("%m-%d"), {}).get(self.prayer)
+        if prayer_time:
+            iqama_time = datetime.strptime(prayer_time, "%H:%M") + timedelta(minutes=int(self.iqama_delay[self.prayer]))
+            self._state = iqama_time.strftime("%H:%M")
+
+
+def legacy_entities(base_path):
+    sensors = []
+    for city in loader.list_cities(base_path):
+        with open(os.path.join(base_path, city, "iqama.csv"), "r") as file:
+            iqama_times = next(csv.DictReader(file))
+        for prayer in ("Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"):
+            sensors.append(LegacyPrayerTimeSensor(base_path, city, prayer))
+            sensors.append(LegacyIqamaTimeSensor(base_path, city, prayer, iqama_times))
+        sensors.append(LegacyPrayerTimeSensor(base_path, city, "Shurouq"))
+    for sensor in sensors:
+        sensor.update()
+    return sensors
+
+
+def retained(function, *args):
+    """(résultat, octets encore alloués par function une fois terminée)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def run(count):
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        base_path = os.path.join(root, "data")
+        generate_tree(base_path, count)
+        os.makedirs(os.path.join(root, ".storage"))
+
+        sensors, size = retained(legacy_entities, base_path)
+        results["legacy"] = (size / count, len(sensors) / count)
+        del sensors
+
+        (hass, entities), size = retained(run_setup, base_path, root)
+        results["current"] = (size / count, len(entities) / count)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cities", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args()
+
+    report = {count: run(count) for count in args.cities}
+    if args.json:
+        print(json.dumps({
+            str(count): {
+                path: {"bytes_per_city": values[0], "entities_per_city": values[1]}
+                for path, values in paths.items()
+            }
+            for count, paths in report.items()
+        }, indent=2))
+        return
+    print(f"{'villes':>7} {'modèle':<8} {'octets/ville':>13} {'entités/ville':>14}")
+    for count, paths in report.items():
+        for path, (per_city, entities) in paths.items():
+            print(f"{count:>7} {path:<8} {per_city:>13.0f} {entities:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Rafraîchissement des mosquées distantes contre un serveur local factice.
+
+Usage : python benchmarks/bench_remote.py [--mosques 100] [--latency 50] [--json]
+
+Un serveur aiohttp local sert un calendrier Mawaqit par mosquée, avec une
+latence artificielle (en millisecondes) et un ETag. Pour chaque chemin,
+deux passages sont mesurés :
+
+- full : premier téléchargement (réponses 200), calendriers validés et
+  écrits en MM.csv dans un répertoire temporaire ;
+- conditional : même passage avec les validateurs du premier (réponses 304,
+  rien n'est réécrit).
+
+Chemins comparés : serial (une requête à la fois, comme des appels
+bloquants successifs), pooled (async_fetch_all, MAX_PARALLEL requêtes à la
+fois sur une seule session) et unbounded (toutes les requêtes à la fois).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.prayer_times.remote import (  # noqa: E402
+    MAX_PARALLEL,
+    RemoteSource,
+    async_fetch_all,
+    write_calendar,
+)
+
+_BASE_MINUTES = (360, 450, 800, 1000, 1150, 1250)
+_AMPLITUDE = (90, 80, 10, 60, 110, 120)
+
+
+def generate_calendar(seed):
+    """Calendrier Mawaqit synthétique : douze mois de six heures par jour."""
+    months = [{} for _ in range(12)]
+    day = date(2024, 1, 1)
+    while day.year == 2024:
+        phase = math.cos(2 * math.pi * (day.timetuple().tm_yday + 10) / 366)
+        times = []
+        for base, amplitude in zip(_BASE_MINUTES, _AMPLITUDE):
+            minutes = int(base + amplitude * phase) + seed % 7
+            times.append(f"{minutes // 60:02}:{minutes % 60:02}")
+        months[day.month - 1][str(day.day)] = times
+        day += timedelta(days=1)
+    return json.dumps({"calendar": months}).encode()
+
+
+class MockServer:
+    """Serveur de calendriers avec latence, ETag et compteur de requêtes."""
+
+    def __init__(self, count, latency):
+        self.latency = latency
+        self.bodies = {f"mosque-{index}": generate_calendar(index) for index in range(count)}
+        self.etags = {uuid: f'"{hashlib.sha1(body).hexdigest()}"' for uuid, body in self.bodies.items()}
+        self.requests = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            uuid = request.match_info["uuid"]
+            if uuid not in self.bodies:
+                raise web.HTTPNotFound()
+            etag = self.etags[uuid]
+            if request.headers.get("If-None-Match") == etag:
+                self.not_modified += 1
+                return web.Response(status=304, headers={"ETag": etag})
+            return web.Response(body=self.bodies[uuid], content_type="application/json", headers={"ETag": etag})
+        finally:
+            self.in_flight -= 1
+
+    def reset(self):
+        self.requests = self.not_modified = self.max_in_flight = 0
+
+
+async def refresh(session, sources, validators, parallel):
+    """Un passage : téléchargement puis écriture des calendriers modifiés."""
+    fetched = await async_fetch_all(session, sources, validators, parallel)
+    written = 0
+    for source in sources:
+        body, source_validators = fetched[source.key]
+        if body is not None:
+            errors = write_calendar(source, body)
+            if errors:
+                raise RuntimeError(errors[0])
+            written += 1
+        validators[source.key] = source_validators
+    return written
+
+
+async def run(count, latency):
+    server = MockServer(count, latency / 1000)
+    app = web.Application()
+    app.router.add_get("/api/2.0/mosque/{uuid}/prayer-times", server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    paths = {"serial": 1, "pooled": MAX_PARALLEL, "unbounded": count}
+    results = {}
+    try:
+        for path, parallel in paths.items():
+            with tempfile.TemporaryDirectory() as data_dir:
+                sources = [
+                    RemoteSource(f"city{index}", f"http://127.0.0.1:{port}", uuid, data_dir)
+                    for index, uuid in enumerate(server.bodies)
+                ]
+                validators = {}
+                # Une seule session, comme celle partagée par Home Assistant
+                async with aiohttp.ClientSession() as session:
+                    for phase in ("full", "conditional"):
+                        server.reset()
+                        start = time.perf_counter()
+                        written = await refresh(session, sources, validators, parallel)
+                        results[(path, phase)] = {
+                            "seconds": time.perf_counter() - start,
+                            "requests": server.requests,
+                            "not_modified": server.not_modified,
+                            "max_in_flight": server.max_in_flight,
+                            "written": written,
+                        }
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mosques", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=50, help="latence du serveur, en millisecondes")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.mosques, args.latency))
+    if args.json:
+        print(json.dumps({f"{path}/{phase}": values for (path, phase), values in results.items()}, indent=2))
+        return
+    print(f"{args.mosques} mosquées, latence {args.latency:.0f} ms")
+    print(f"{'chemin':<10} {'passage':<12} {'temps (s)':>10} {'requêtes':>9} {'304':>5} {'simultanées':>12} {'écrites':>8}")
+    for (path, phase), values in results.items():
+        print(
+            f"{path:<10} {phase:<12} {values['seconds']:>10.3f} {values['requests']:>9}"
+            f" {values['not_modified']:>5} {values['max_in_flight']:>12} {values['written']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
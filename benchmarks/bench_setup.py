@@ -0,0 +1,242 @@
+"""Mesure du coût de démarrage et de mise à jour pour N villes synthétiques.
+
+Usage : python benchmarks/bench_setup.py [--cities 10 100 500] [--json]
+
+Pour chaque taille, un arbre data/<ville>/ est généré dans un répertoire
+temporaire puis chargé par plusieurs chemins :
+
+- legacy : l'ancien setup_platform (un mois par ville, DictReader) et sa
+  boucle de mise à jour toutes les 10 s ;
+- csv : load_cities, sans cache ;
+- cache : CityCache avec son cache binaire déjà rempli (démarrage à froid) ;
+- binary : fichiers timetable.bin compilés, chargés par mmap ;
+- setup : async_setup_platform de la plateforme de capteurs, dans une
+  instance Home Assistant réelle (création et arrêt compris), avec un
+  async_add_entities factice.
+
+Pour chaque chemin sont mesurés le temps, le pic mémoire (tracemalloc), le
+nombre de fichiers ouverts et le coût d'un "tick" de mise à jour.
+"""
+import argparse
+import asyncio
+import builtins
+import csv
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.prayer_times import loader, sensor  # noqa: E402
+from custom_components.prayer_times.build import compile_city  # noqa: E402
+from custom_components.prayer_times.coordinator import compute_day  # noqa: E402
+from custom_components.prayer_times.events import SALAT, next_event_at  # noqa: E402
+
+PRAYERS = ("Fajr", "Shurouq", "Dhuhr", "Asr", "Maghrib", "Isha")
+_BASE_MINUTES = (360, 450, 800, 1000, 1150, 1250)
+_AMPLITUDE = (90, 80, 10, 60, 110, 120)
+
+
+def generate_city(city_path, seed):
+    """Écrire les douze mois, iqama.csv et vendredi.csv d'une ville synthétique."""
+    os.makedirs(city_path, exist_ok=True)
+    day = datetime(2024, 1, 1)
+    while day.year == 2024:
+        month = day.month
+        with open(os.path.join(city_path, f"{month:02}.csv"), "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("date", *PRAYERS))
+            while day.month == month:
+                phase = math.cos(2 * math.pi * (day.timetuple().tm_yday + 10) / 366)
+                times = []
+                for base, amplitude in zip(_BASE_MINUTES, _AMPLITUDE):
+                    minutes = int(base + amplitude * phase) + seed % 7
+                    times.append(f"{minutes // 60:02}:{minutes % 60:02}")
+                writer.writerow((day.strftime("%m-%d"), *times))
+                day += timedelta(days=1)
+    with open(os.path.join(city_path, "iqama.csv"), "w") as file:
+        file.write("Fajr,Dhuhr,Asr,Maghrib,Isha\n10,10,10,0,10\n")
+    with open(os.path.join(city_path, "vendredi.csv"), "w") as file:
+        file.write("13:00\n")
+
+
+def generate_tree(base_path, count):
+    for index in range(count):
+        generate_city(os.path.join(base_path, f"ville_{index:04}"), index)
+
+
+class _OpenCounter:
+    """Compter les appels à open() pendant une mesure."""
+
+    def __init__(self):
+        self.count = 0
+        self._open = builtins.open
+
+    def __enter__(self):
+        def counting_open(*args, **kwargs):
+            self.count += 1
+            return self._open(*args, **kwargs)
+
+        builtins.open = counting_open
+        return self
+
+    def __exit__(self, *exc):
+        builtins.open = self._open
+
+
+def measure(function, *args):
+    """(résultat, secondes, pic mémoire en octets, fichiers ouverts).
+
+    tracemalloc ralentit fortement l'exécution : le temps est mesuré sur une
+    première exécution, la mémoire sur une seconde.
+    """
+    with _OpenCounter() as opens:
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak, opens.count
+
+
+def time_tick(function, repeat=20):
+    """Durée moyenne d'un tick de mise à jour, en secondes."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+# --- Ancien chemin, reproduit tel quel pour comparaison ----------------------
+
+def legacy_setup(base_path):
+    month = datetime.now().month
+    sensors = []
+    for city in loader.list_cities(base_path):
+        prayer_times = {}
+        with open(os.path.join(base_path, city, f"{month:02}.csv"), "r") as file:
+            for row in csv.DictReader(file):
+                prayer_times[row["date"]] = {prayer: row[prayer] for prayer in PRAYERS}
+        with open(os.path.join(base_path, city, "iqama.csv"), "r") as file:
+            iqama_times = next(csv.DictReader(file))
+        with open(os.path.join(base_path, city, "vendredi.csv"), "r") as file:
+            friday_time = file.readline().strip()
+        for prayer in ("Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"):
+            sensors.append(("adhan", prayer, prayer_times, iqama_times))
+            sensors.append(("iqama", prayer, prayer_times, iqama_times))
+        sensors.append(("friday", None, friday_time, None))
+    return sensors
+
+
+def legacy_tick(sensors):
+    for kind, prayer, times, iqama in sensors:
+        if kind == "friday":
+            continue
+        today = datetime.now().strftime("%m-%d")
+        value = times.get(today, {}).get(prayer)
+        if kind == "iqama" and value:
+            value = (datetime.strptime(value, "%H:%M") + timedelta(minutes=int(iqama[prayer]))).strftime("%H:%M")
+
+
+# --- Nouveaux chemins --------------------------------------------------------
+
+def prepare_days(cities):
+    """Horaires d'aujourd'hui et de demain, calculés une fois par jour."""
+    today = datetime.now(timezone.utc).date()
+    return [
+        (compute_day(data, today, timezone.utc), compute_day(data, today + timedelta(days=1), timezone.utc))
+        for data in cities.values()
+    ]
+
+
+def cities_tick(days):
+    """Ce que coûte une transition : la prochaine prière de chaque ville."""
+    timestamp = int(time.time())
+    for schedule, tomorrow in days:
+        next_event_at(schedule.events, tomorrow.events, timestamp, SALAT)
+
+
+def run_setup(base_path, root):
+    """Exécuter async_setup_platform dans une instance Home Assistant réelle.
+
+    L'instance est créée sur root (son .storage reçoit le cache et
+    l'instantané), sans intégration chargée, puis arrêtée : l'arrêt annule
+    les réveils et minuteurs de l'intégration.
+    """
+    entities = []
+
+    async def _run():
+        hass = HomeAssistant(root)
+        hass.config.set_time_zone("UTC")
+        sensor.BASE_DATA_PATH = base_path
+        await sensor.async_setup_platform(hass, {}, entities.extend)
+        await hass.async_stop(force=True)
+        return hass
+
+    hass = asyncio.run(_run())
+    return hass, entities
+
+
+def run(count):
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        base_path = os.path.join(root, "data")
+        generate_tree(base_path, count)
+        os.makedirs(os.path.join(root, ".storage"))
+
+        sensors, elapsed, peak, opens = measure(legacy_setup, base_path)
+        results["legacy"] = (elapsed, peak, opens, time_tick(lambda: legacy_tick(sensors)))
+
+        cities, elapsed, peak, opens = measure(loader.load_cities, base_path)
+        days = prepare_days(cities)
+        results["csv"] = (elapsed, peak, opens, time_tick(lambda: cities_tick(days)))
+
+        cache_file = os.path.join(root, ".storage", "bench.cache")
+        loader.CityCache(base_path, cache_file).load_all()
+        _, elapsed, peak, opens = measure(lambda: loader.CityCache(base_path, cache_file).load_all())
+        results["cache"] = (elapsed, peak, opens, time_tick(lambda: cities_tick(days)))
+
+        (hass, entities), elapsed, peak, opens = measure(run_setup, base_path, root)
+        results["setup"] = (elapsed, peak, opens, time_tick(lambda: [entity.state for entity in entities]))
+
+        for city in loader.list_cities(base_path):
+            compile_city(base_path, city)
+        cities, elapsed, peak, opens = measure(loader.load_cities, base_path)
+        days = prepare_days(cities)
+        results["binary"] = (elapsed, peak, opens, time_tick(lambda: cities_tick(days)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cities", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args()
+
+    report = {count: run(count) for count in args.cities}
+    if args.json:
+        print(json.dumps({
+            str(count): {
+                path: {"seconds": values[0], "peak_bytes": values[1], "opens": values[2], "tick_seconds": values[3]}
+                for path, values in paths.items()
+            }
+            for count, paths in report.items()
+        }, indent=2))
+        return
+    print(f"{'villes':>7} {'chemin':<8} {'temps (ms)':>11} {'pic (Kio)':>10} {'ouvertures':>11} {'tick (µs)':>10}")
+    for count, paths in report.items():
+        for path, (elapsed, peak, opens, tick) in paths.items():
+            print(f"{count:>7} {path:<8} {elapsed * 1000:>11.1f} {peak / 1024:>10.0f} {opens:>11} {tick * 1e6:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
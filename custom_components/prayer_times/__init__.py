@@ -1,22 +1,167 @@
+"""Intégration Prayer Times.
+
+Home Assistant n'est importé que dans les fonctions : les outils en ligne
+de commande (python -m custom_components.prayer_times.build, .pipeline)
+importent ce paquet et doivent fonctionner sans Home Assistant installé.
+Seul le schéma de la configuration YAML est défini à l'import, quand
+Home Assistant est présent.
+"""
+from __future__ import annotations
+
 import logging
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import discovery  
+import os
+from typing import TYPE_CHECKING
+
+from .const import (
+    API,
+    CONF_ANNOUNCEMENTS,
+    CONF_CITY,
+    CONF_DATA_DIR,
+    CONF_IDLE_TIMEOUT,
+    CONF_LAZY_LOAD,
+    CONF_REMOTE,
+    CONF_SERVER,
+    CONF_UPCOMING_LEAD,
+    CONF_UUID,
+    DEFAULT_DATA_DIR,
+    MAX_UPCOMING_LEAD,
+    PASSWORD,
+    PLATFORMS,
+    USERNAME,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+try:
+    import voluptuous as vol
+    from homeassistant.helpers import config_validation as cv
+except ImportError:
+    # Outils en ligne de commande sans Home Assistant : pas de schéma
+    vol = None
 
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = "prayer_times"
 
+if vol is not None:
+    REMOTE_SCHEMA = vol.Schema(
+        {
+            vol.Required(CONF_CITY): cv.string,
+            vol.Required(CONF_SERVER): cv.url,
+            vol.Required(CONF_UUID): cv.string,
+            vol.Optional(CONF_DATA_DIR): cv.string,
+            vol.Optional(API): cv.string,
+            vol.Optional(USERNAME): cv.string,
+            vol.Optional(PASSWORD): cv.string,
+        }
+    )
+
+    # prayer_times: peut rester vide, toutes les villes de data/ sont alors chargées
+    CONFIG_SCHEMA = vol.Schema(
+        {
+            DOMAIN: vol.Any(
+                None,
+                vol.Schema(
+                    {
+                        vol.Optional(CONF_LAZY_LOAD): cv.boolean,
+                        vol.Optional(CONF_IDLE_TIMEOUT): cv.positive_int,
+                        vol.Optional(CONF_ANNOUNCEMENTS): cv.boolean,
+                        vol.Optional(CONF_UPCOMING_LEAD): vol.All(
+                            cv.ensure_list,
+                            [vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_UPCOMING_LEAD))],
+                        ),
+                        vol.Optional(CONF_REMOTE): vol.All(cv.ensure_list, [REMOTE_SCHEMA]),
+                    }
+                ),
+            )
+        },
+        extra=vol.ALLOW_EXTRA,
+    )
+
 async def async_setup(hass: HomeAssistant, config: dict):
     """Configurer le domaine au chargement."""
+    from homeassistant.helpers import discovery
+
+    from .services import async_setup_services
+
     _LOGGER.debug("Initialisation de l'intégration Prayer Times.")
-    
-    # Charge la plateforme de capteurs de manière asynchrone
-    await discovery.async_load_platform(hass, "sensor", DOMAIN, {}, config)
-    
+
+    # Configuration YAML : toutes les villes du répertoire data/
+    if DOMAIN in config:
+        options = dict(config.get(DOMAIN) or {})
+        remote = options.pop(CONF_REMOTE, None)
+        if remote:
+            # Importé seulement si des mosquées distantes sont configurées
+            from .remote import async_setup_remote
+
+            # Horaires distants écrits dans data/ avant la lecture des villes
+            await async_setup_remote(hass, remote)
+        # Les options du domaine (lazy_load, idle_timeout, announcements, upcoming_lead) sont transmises à la plateforme
+        await discovery.async_load_platform(hass, "sensor", DOMAIN, options, config)
+        await discovery.async_load_platform(hass, "calendar", DOMAIN, {}, config)
+
+    # Requêtes groupées : prayer_times.get_schedule
+    async_setup_services(hass)
+
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
-    """Configurer la plateforme via Config Flow si utilisé dans le futur."""
-    await hass.config_entries.async_setup_platforms(entry, ["sensor"])
+    """Charger une seule mosquée, sans toucher aux autres."""
+    from homeassistant.exceptions import ConfigEntryNotReady
+
+    from .announcements import announce_leads
+    from .coordinator import PrayerTimesCoordinator
+    from .shared import async_get_cache, async_get_domain_data, async_get_snapshot
+
+    city = entry.data[CONF_CITY]
+    cache = async_get_cache(hass, entry.data.get(CONF_DATA_DIR, DEFAULT_DATA_DIR))
+    domain_data = async_get_domain_data(hass)
+    snapshot = await async_get_snapshot(hass)
+
+    coordinator = PrayerTimesCoordinator(
+        hass,
+        domain_data["scheduler"],
+        cache,
+        city,
+        snapshot=snapshot,
+        stats=domain_data["stats"],
+        announce_leads=announce_leads(entry.options),
+        unique_key=entry.entry_id,
+    )
+    if coordinator.async_restore():
+        # Entités à jour tout de suite ; les fichiers sont vérifiés ensuite
+        hass.async_create_task(coordinator.async_verify())
+    else:
+        data = cache.get(city) or await hass.async_add_executor_job(cache.load, city)
+        if not data.timetable or not data.timetable.has_iqama():
+            raise ConfigEntryNotReady(f"Les données de prière ou d'iqama sont manquantes pour la ville : {city}")
+        coordinator.async_set_city_data(data)
+    domain_data["coordinators"][entry.entry_id] = coordinator
+
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # Options modifiées (annonces) : l'entrée est rechargée
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     return True
+
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry):
+    await hass.config_entries.async_reload(entry.entry_id)
+
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Décharger une mosquée ; ses données sont libérées avec ses entités."""
+    from .shared import async_get_domain_data
+
+    unloaded = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unloaded:
+        coordinator = async_get_domain_data(hass)["coordinators"].pop(entry.entry_id)
+        coordinator.async_cancel()
+    return unloaded
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Oublier l'instantané d'une mosquée supprimée."""
+    from .shared import async_get_snapshot
+
+    data_dir = os.path.abspath(entry.data.get(CONF_DATA_DIR, DEFAULT_DATA_DIR))
+    snapshot = await async_get_snapshot(hass)
+    snapshot.async_remove(f"{data_dir}:{entry.data[CONF_CITY]}")
@@ -0,0 +1,116 @@
+"""Événements Home Assistant avant et à l'heure de chaque prière.
+
+Les annonces d'une ville sont préparées une fois par jour, avec l'horaire
+du jour : une liste triée (instant, type, données). Une seule entrée du
+planificateur par ville pointe vers la prochaine annonce ; à son réveil,
+les annonces échues sont envoyées sur le bus et l'entrée suivante est
+planifiée. Une automatisation n'a plus qu'à écouter l'événement :
+
+    trigger:
+      - platform: event
+        event_type: prayer_times_upcoming
+        event_data:
+          city: oissel
+          minutes_before: 15
+"""
+from bisect import bisect_right
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import CONF_ANNOUNCEMENTS, CONF_UPCOMING_LEAD, DEFAULT_UPCOMING_LEAD, DOMAIN
+from .events import ADHAN, EID, IQAMA, JUMUA, TARAWEEH, local_epoch
+from .timetable import format_minutes
+
+EVENT_UPCOMING = f"{DOMAIN}_upcoming"
+EVENT_ADHAN = f"{DOMAIN}_adhan"
+EVENT_IQAMA = f"{DOMAIN}_iqama"
+
+# Événements annoncés à l'avance et à l'heure de l'adhan
+ANNOUNCED_KINDS = frozenset((ADHAN, JUMUA, EID, TARAWEEH))
+
+# Une annonce manquée de plus de tant de secondes (redémarrage) n'est pas envoyée
+MAX_DELAY = 60
+
+
+def announce_leads(options):
+    """Délais des annonces à l'avance d'après les options, None si les annonces sont désactivées."""
+    if not options.get(CONF_ANNOUNCEMENTS, True):
+        return None
+    return options.get(CONF_UPCOMING_LEAD, DEFAULT_UPCOMING_LEAD)
+
+
+def day_announcements(city, today, tomorrow, leads, zone, yesterday=None):
+    """Annonces (instant UTC, type, données) du jour de today, triées.
+
+    Les annonces à l'avance des premières prières de tomorrow qui tombent
+    encore ce jour-ci sont comprises, comme les événements de yesterday
+    passés minuit (l'iqama d'un Isha tardif).
+    """
+    start = local_epoch(today.day, 0, zone)
+    end = local_epoch(tomorrow.day, 0, zone)
+    announcements = []
+    for schedule in (yesterday, today, tomorrow):
+        if schedule is None:
+            continue
+        # Le vendredi, pas d'iqama de Dhuhr : Jumua la remplace
+        prayers = {name for _, kind, name in schedule.events.events if kind in ANNOUNCED_KINDS}
+        for epoch, (minutes, kind, name) in zip(schedule.events.epochs, schedule.events.events):
+            data = {"city": city, "prayer": name, "kind": kind, "time": format_minutes(minutes)}
+            if kind == IQAMA:
+                if name not in prayers:
+                    continue
+                announcements.append((epoch, EVENT_IQAMA, data))
+            elif kind in ANNOUNCED_KINDS:
+                announcements.append((epoch, EVENT_ADHAN, data))
+                for lead in leads:
+                    announcements.append((epoch - lead * 60, EVENT_UPCOMING, {**data, "minutes_before": lead}))
+    announcements = [item for item in announcements if start <= item[0] < end]
+    announcements.sort(key=lambda item: item[0])
+    return announcements
+
+
+class CityAnnouncer:
+    """Annonces d'une ville, une entrée du planificateur à la fois."""
+
+    def __init__(self, hass: HomeAssistant, scheduler, city, leads):
+        self.hass = hass
+        self.scheduler = scheduler
+        self.city = city
+        self.leads = tuple(sorted(set(leads), reverse=True))
+        self._announcements = []
+        self._epochs = []
+        self._next = 0
+
+    @callback
+    def async_set_day(self, today, tomorrow, zone, yesterday=None):
+        """Préparer les annonces du jour et planifier la prochaine."""
+        self._announcements = day_announcements(self.city, today, tomorrow, self.leads, zone, yesterday)
+        self._epochs = [item[0] for item in self._announcements]
+        self._next = bisect_right(self._epochs, dt_util.utcnow().timestamp() - MAX_DELAY)
+        self._async_schedule_next()
+
+    @callback
+    def async_cancel(self):
+        self.scheduler.async_cancel(self)
+        self._announcements = []
+        self._epochs = []
+        self._next = 0
+
+    @callback
+    def _async_schedule_next(self):
+        if self._next < len(self._epochs):
+            self.scheduler.async_schedule(self, self._epochs[self._next], self._async_announce)
+        else:
+            self.scheduler.async_cancel(self)
+
+    @callback
+    def _async_announce(self, now):
+        timestamp = now.timestamp()
+        while self._next < len(self._epochs) and self._epochs[self._next] <= timestamp:
+            epoch, event_type, data = self._announcements[self._next]
+            self._next += 1
+            if timestamp - epoch > MAX_DELAY:
+                continue
+            self.hass.bus.async_fire(event_type, data)
+        self._async_schedule_next()
@@ -0,0 +1,154 @@
+"""Format binaire compact d'une ville, chargé par mmap sans copie.
+
+Disposition (petit-boutiste) : un en-tête "PRTT", la version et le nombre de
+sections, puis une table de sections (étiquette, position, nombre de valeurs)
+et les sections elles-mêmes, des tableaux uint16 :
+
+- ADHN : minutes des prières, 366 jours x 6 prières ;
+- IQAM : minutes des iqamas, même disposition ;
+- SPEC : horaires particuliers (vendredi, Aïd, tarawih), 366 jours x SPECIAL ;
+- SPYR : l'année des prières datées de SPEC, 0 s'il n'y en a pas ;
+- YEAR : l'année des horaires calculés (localisation.csv), 0 s'il n'y en a
+  pas. Absente des premiers fichiers version 2 : l'année est alors
+  inconnue et les horaires calculés sont refaits au chargement.
+
+La version 1 avait une section JUMU, une seule heure du vendredi : ses
+fichiers sont refusés et la ville est relue depuis ses CSV.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .timetable import DAYS_PER_YEAR, PRAYERS, SPECIAL, Timetable
+
+MAGIC = b"PRTT"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sHH")
+_SECTION = struct.Struct("<4sII")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def pack_city(timetable):
+    """Sérialiser les données d'une ville."""
+    sections = [
+        (b"ADHN", timetable.minutes),
+        (b"IQAM", timetable.iqama),
+        (b"SPEC", timetable.special),
+        (b"SPYR", [timetable.special_year or 0]),
+        (b"YEAR", [timetable.year or 0]),
+    ]
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    header = [_HEADER.pack(MAGIC, VERSION, len(sections))]
+    payload = []
+    for tag, values in sections:
+        values = array("H", values)
+        if not _LITTLE_ENDIAN:
+            values.byteswap()
+        header.append(_SECTION.pack(tag, offset, len(values)))
+        payload.append(values.tobytes())
+        offset += len(values) * values.itemsize
+    return b"".join(header + payload)
+
+
+def write_city(path, timetable):
+    """Écrire le fichier binaire d'une ville de façon atomique."""
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as file:
+        file.write(pack_city(timetable))
+    os.replace(temp, path)
+
+
+def _sections(buffer):
+    if len(buffer) < _HEADER.size:
+        raise ValueError("fichier binaire tronqué")
+    magic, version, count = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("format binaire inconnu")
+    if len(buffer) < _HEADER.size + count * _SECTION.size:
+        raise ValueError("fichier binaire tronqué")
+    sections = {}
+    for index in range(count):
+        tag, offset, length = _SECTION.unpack_from(buffer, _HEADER.size + index * _SECTION.size)
+        if offset + length * 2 > len(buffer):
+            raise ValueError("fichier binaire tronqué")
+        sections[tag] = (offset, length)
+    return sections
+
+
+def _uint16(view, offset, length):
+    values = view[offset:offset + length * 2]
+    if _LITTLE_ENDIAN:
+        # Vue directe sur les pages projetées, sans copie
+        return values.cast("H")
+    values = array("H", values.tobytes())
+    values.byteswap()
+    return values
+
+
+def checksum(data):
+    """Empreinte SHA-256 (hexadécimale) d'un contenu."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_city_binary(path, city, expected=None):
+    """Projeter le fichier binaire d'une ville en mémoire (appel bloquant).
+
+    Avec expected, l'empreinte du fichier doit être celle du manifeste.
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if expected is not None and checksum(view) != expected:
+        raise ValueError("empreinte différente du manifeste")
+    sections = _sections(view)
+    size = DAYS_PER_YEAR * len(PRAYERS)
+    if (
+        sections[b"ADHN"][1] != size
+        or sections[b"IQAM"][1] != size
+        or sections[b"SPEC"][1] != DAYS_PER_YEAR * len(SPECIAL)
+        or sections[b"SPYR"][1] != 1
+        or sections.get(b"YEAR", (0, 1))[1] != 1
+    ):
+        raise ValueError("dimensions inattendues")
+    timetable = Timetable(
+        city,
+        _uint16(view, *sections[b"ADHN"]),
+        _uint16(view, *sections[b"IQAM"]),
+        _uint16(view, *sections[b"SPEC"]),
+    )
+    timetable.special_year = _uint16(view, *sections[b"SPYR"])[0] or None
+    if b"YEAR" in sections:
+        timetable.year = _uint16(view, *sections[b"YEAR"])[0] or None
+    return timetable
+
+
+def is_fresh(path, sources):
+    """Vrai si le fichier binaire existe et est plus récent que ses sources."""
+    try:
+        compiled = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    for source in sources:
+        try:
+            if os.stat(source).st_mtime_ns > compiled:
+                return False
+        except FileNotFoundError:
+            continue
+    return True
+
+
+def read_manifest(path):
+    """Empreintes des fichiers compilés par ville, ou {} sans manifeste."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return {}
+    if manifest.get("version") != VERSION:
+        raise ValueError("version de manifeste inconnue")
+    return {city: entry["sha256"] for city, entry in manifest["cities"].items()}
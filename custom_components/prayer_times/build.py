@@ -0,0 +1,147 @@
+"""Compilation hors ligne des données des villes.
+
+Usage : python -m custom_components.prayer_times.build <data> [ville ...] [--jobs N]
+
+Chaque ville est validée puis compilée dans un processus du pool. Le
+manifeste data/manifest.json liste les fichiers compilés avec leurs
+empreintes : au démarrage, les villes qui y figurent sont chargées depuis
+leur fichier compilé sans relire les CSV.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .binary import VERSION, checksum, write_city
+from .const import BINARY_FILE, LOCATION_FILE, MANIFEST_FILE
+from .loader import city_files, list_cities, load_csv_city
+from .pipeline import process_city
+
+
+def compile_city(base_path, city, time_zone=None):
+    """Lire les CSV d'une ville et écrire son fichier binaire.
+
+    time_zone sert aux villes sans fuseau dans localisation.csv (saisons des
+    règles du vendredi, horaires calculés).
+    """
+    city_path = os.path.join(base_path, city)
+    data = load_csv_city(city_path, city, time_zone=time_zone)
+    path = os.path.join(city_path, BINARY_FILE)
+    write_city(path, data.timetable)
+    return path
+
+
+def _file_checksum(path):
+    with open(path, "rb") as file:
+        return checksum(file.read())
+
+
+def build_city(base_path, city, time_zone=None):
+    """Valider puis compiler une ville (exécuté dans un processus du pool).
+
+    Renvoie (ville, entrée du manifeste ou None, erreurs).
+    """
+    city_path = os.path.join(base_path, city)
+    # Avec localisation.csv, les mois fournis peuvent être incomplets
+    _, _, errors = process_city(city_path, partial=os.path.exists(os.path.join(city_path, LOCATION_FILE)))
+    if errors:
+        return city, None, errors
+    path = compile_city(base_path, city, time_zone)
+    sources = {
+        os.path.basename(source): _file_checksum(source)
+        for source in city_files(city_path)
+        if os.path.exists(source)
+    }
+    entry = {
+        "file": os.path.relpath(path, base_path).replace(os.sep, "/"),
+        "sha256": _file_checksum(path),
+        "sources": sources,
+    }
+    return city, entry, []
+
+
+def write_manifest(base_path, entries):
+    """Écrire le manifeste de façon atomique, villes triées."""
+    path = os.path.join(base_path, MANIFEST_FILE)
+    temp = f"{path}.tmp"
+    with open(temp, "w", encoding="utf-8") as file:
+        json.dump({"version": VERSION, "cities": dict(sorted(entries.items()))}, file, indent=1)
+    os.replace(temp, path)
+    return path
+
+
+def read_entries(base_path):
+    """Entrées du manifeste existant, {} s'il est absent ou illisible."""
+    try:
+        with open(os.path.join(base_path, MANIFEST_FILE), encoding="utf-8") as file:
+            return json.load(file).get("cities", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def rebuild_cities(base_path, cities, time_zone=None):
+    """Recompiler, sans pool de processus, celles des villes qui sont au manifeste.
+
+    Sert après une écriture de leurs CSV (horaires distants) : seul le fichier
+    compilé est lu au chargement. Une ville en erreur est retirée du
+    manifeste et sera relue depuis ses CSV. Renvoie les erreurs par ville.
+    """
+    entries = read_entries(base_path)
+    compiled = [city for city in cities if city in entries]
+    if not compiled:
+        return {}
+    failures = {}
+    for city in compiled:
+        try:
+            _, entry, errors = build_city(base_path, city, time_zone)
+        except (OSError, ValueError) as err:
+            entry, errors = None, [f"{city} : {err}"]
+        if entry is None:
+            entries.pop(city, None)
+            failures[city] = errors
+        else:
+            entries[city] = entry
+    write_manifest(base_path, entries)
+    return failures
+
+
+def build_all(base_path, cities=None, jobs=None, time_zone=None):
+    """Compiler les villes en parallèle ; renvoie (entrées, erreurs par ville).
+
+    Les villes non demandées gardent leur entrée du manifeste existant.
+    """
+    entries = read_entries(base_path)
+    failures = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(build_city, base_path, city, time_zone) for city in cities or list_cities(base_path)]
+        for future in futures:
+            city, entry, errors = future.result()
+            if entry is None:
+                # Une ville invalide est retirée : elle sera relue depuis ses CSV
+                entries.pop(city, None)
+                failures[city] = errors
+            else:
+                entries[city] = entry
+    write_manifest(base_path, entries)
+    return entries, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compiler les CSV des villes en fichiers binaires.")
+    parser.add_argument("data_dir", help="répertoire data/ contenant un dossier par ville")
+    parser.add_argument("cities", nargs="*", help="villes à compiler (toutes par défaut)")
+    parser.add_argument("--jobs", type=int, default=None, help="nombre de processus")
+    parser.add_argument("--time-zone", default=None, help="fuseau des villes qui n'en déclarent pas (ex. Europe/Paris)")
+    args = parser.parse_args(argv)
+    entries, failures = build_all(args.data_dir, args.cities, args.jobs, args.time_zone)
+    for city, errors in failures.items():
+        for error in errors:
+            print(error, file=sys.stderr)
+        print(f"{city} : non compilée, {len(errors)} erreur(s)", file=sys.stderr)
+    print(f"{len(entries)} ville(s) au manifeste")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
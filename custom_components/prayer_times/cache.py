@@ -0,0 +1,129 @@
+"""Cache des fichiers analysés, invalidé par date, taille et empreinte."""
+import hashlib
+import logging
+import marshal
+import os
+import tempfile
+import threading
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+
+
+def read_file(path, parser):
+    """Lire et analyser un fichier texte, sans cache."""
+    with open(path, "rb") as file:
+        return parser(file.read().decode("utf-8"))
+
+
+class FileCache:
+    """Résultats d'analyse par chemin de fichier.
+
+    Une entrée est réutilisée tant que (mtime, taille) n'a pas changé ; sinon
+    le fichier est relu et n'est réanalysé que si son empreinte a changé.
+    Les résultats doivent être sérialisables par marshal. Les lectures
+    peuvent venir de plusieurs fils de l'exécuteur en même temps : les
+    modifications des entrées et l'enregistrement passent par un verrou.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def read(self, path, parser):
+        """Comme read_file, mais sans réanalyser un fichier inchangé."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._forget(path)
+            raise
+        entry = self._entries.get(path)
+        if entry is not None and entry[2] is None:
+            # Fichier seulement surveillé, jamais analysé
+            entry = None
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            self.hits += 1
+            return entry[3]
+        with open(path, "rb") as file:
+            content = file.read()
+        digest = hashlib.sha1(content).digest()
+        if entry is not None and entry[2] == digest:
+            value = entry[3]
+            self.hits += 1
+        else:
+            _LOGGER.debug("Analyse du fichier : %s", path)
+            value = parser(content.decode("utf-8"))
+            self.misses += 1
+        with self._lock:
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, digest, value)
+            self.dirty = True
+        return value
+
+    def track(self, path):
+        """Surveiller un fichier sans l'analyser, pour is_stale."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._forget(path)
+            return
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+            with self._lock:
+                self._entries[path] = (stat.st_mtime_ns, stat.st_size, None, None)
+                self.dirty = True
+
+    def _forget(self, path):
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self.dirty = True
+
+    def is_stale(self, path):
+        """Vrai si le fichier a changé, est apparu ou a disparu depuis sa lecture."""
+        entry = self._entries.get(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return entry is not None
+        return entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size
+
+    def load(self, filename):
+        """Recharger le cache enregistré par save (appel bloquant)."""
+        try:
+            with open(filename, "rb") as file:
+                version, entries = marshal.load(file)
+        except FileNotFoundError:
+            return
+        except (EOFError, ValueError, TypeError):
+            _LOGGER.warning("Cache illisible, il sera reconstruit : %s", filename)
+            return
+        if version == CACHE_VERSION:
+            with self._lock:
+                self._entries.update(entries)
+
+    def save(self, filename):
+        """Enregistrer le cache dans un fichier binaire compact (appel bloquant).
+
+        Le fichier est écrit à part sous un nom unique puis remplacé d'un
+        coup : deux enregistrements simultanés ne se gênent pas.
+        """
+        with self._lock:
+            if not self.dirty:
+                return
+            data = marshal.dumps((CACHE_VERSION, self._entries))
+            self.dirty = False
+        temp = None
+        try:
+            descriptor, temp = tempfile.mkstemp(prefix=f"{os.path.basename(filename)}.", dir=os.path.dirname(filename))
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temp, filename)
+        except OSError:
+            if temp is not None:
+                os.unlink(temp)
+            with self._lock:
+                self.dirty = True
+            raise
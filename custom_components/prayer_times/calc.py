@@ -0,0 +1,159 @@
+"""Calcul astronomique des horaires, pour les villes sans fichiers mensuels.
+
+Algorithme de PrayTimes.org : position du soleil par jour, puis heures des
+angles de chaque prière. Une année entière est calculée en un seul passage
+et mise en cache par (position, méthode, année).
+"""
+import calendar
+import math
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .const import DEFAULT_CALC_METHOD
+from .timetable import DAYS_PER_YEAR, NO_TIME, PRAYERS, day_index
+
+# Angle de Fajr, puis angle d'Isha ou délai en minutes après Maghrib.
+# Les noms sont ceux de CALC_METHODS.
+METHODS = {
+    "MWL": {"fajr": 18, "isha": 17},
+    "ISNA": {"fajr": 15, "isha": 15},
+    "Egypt": {"fajr": 19.5, "isha": 17.5},
+    "Makkah": {"fajr": 18.5, "isha_minutes": 90},
+    "Karachi": {"fajr": 18, "isha": 18},
+    "UOIF": {"fajr": 12, "isha": 12},
+}
+
+ASR_FACTORS = {"standard": 1, "hanafi": 2}
+HIGH_LATITUDE_RULES = ("none", "night_middle", "one_seventh", "angle_based")
+DEFAULT_HIGH_LATITUDE = "night_middle"
+
+_SUNRISE_ANGLE = 0.833
+
+
+def check_parameters(latitude, longitude, method, asr, high_latitude, time_zone):
+    """Vérifier les paramètres d'un calcul ; ValueError pour le premier invalide."""
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(f"position invalide : {latitude}, {longitude}")
+    if method not in METHODS:
+        raise ValueError(f"méthode inconnue : {method!r} (parmi {', '.join(METHODS)})")
+    if asr not in ASR_FACTORS:
+        raise ValueError(f"asr inconnu : {asr!r} (parmi {', '.join(ASR_FACTORS)})")
+    if high_latitude not in HIGH_LATITUDE_RULES:
+        rules = ", ".join(HIGH_LATITUDE_RULES)
+        raise ValueError(f"règle high_latitude inconnue : {high_latitude!r} (parmi {rules})")
+    try:
+        ZoneInfo(time_zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"fuseau horaire inconnu : {time_zone!r}") from None
+
+
+def _sin(degrees):
+    return math.sin(math.radians(degrees))
+
+
+def _cos(degrees):
+    return math.cos(math.radians(degrees))
+
+
+def _sun_position(julian_day):
+    """Déclinaison (degrés) et équation du temps (heures)."""
+    days = julian_day - 2451545.0
+    anomaly = (357.529 + 0.98560028 * days) % 360
+    mean_longitude = (280.459 + 0.98564736 * days) % 360
+    longitude = (mean_longitude + 1.915 * _sin(anomaly) + 0.020 * _sin(2 * anomaly)) % 360
+    obliquity = 23.439 - 0.00000036 * days
+    right_ascension = math.degrees(math.atan2(_cos(obliquity) * _sin(longitude), _cos(longitude))) / 15
+    declination = math.degrees(math.asin(_sin(obliquity) * _sin(longitude)))
+    equation = mean_longitude / 15 - right_ascension % 24
+    return declination, (equation + 12) % 24 - 12
+
+
+def _day_times(julian_day, latitude, params, asr_factor, high_latitude):
+    """Heures solaires (UTC + longitude/15) des six prières d'un jour."""
+
+    def noon(hour):
+        return 12 - _sun_position(julian_day + hour / 24)[1]
+
+    def angle_time(angle, hour, before_noon):
+        declination, equation = _sun_position(julian_day + hour / 24)
+        middle = 12 - equation
+        cosine = (-_sin(angle) - _sin(declination) * _sin(latitude)) / (_cos(declination) * _cos(latitude))
+        if not -1 <= cosine <= 1:
+            return math.nan
+        offset = math.degrees(math.acos(cosine)) / 15
+        return middle - offset if before_noon else middle + offset
+
+    def asr_time(hour):
+        declination = _sun_position(julian_day + hour / 24)[0]
+        angle = -math.degrees(math.atan(1 / (asr_factor + math.tan(math.radians(abs(latitude - declination))))))
+        return angle_time(angle, hour, False)
+
+    fajr = angle_time(params["fajr"], 5, True)
+    sunrise = angle_time(_SUNRISE_ANGLE, 6, True)
+    dhuhr = noon(12)
+    asr = asr_time(13)
+    sunset = angle_time(_SUNRISE_ANGLE, 18, False)
+    if "isha_minutes" in params:
+        isha = sunset + params["isha_minutes"] / 60
+    else:
+        isha = angle_time(params["isha"], 18, False)
+
+    if high_latitude != "none" and not math.isnan(sunrise) and not math.isnan(sunset):
+        night = sunrise + 24 - sunset
+
+        def portion(angle):
+            if high_latitude == "angle_based":
+                return angle / 60 * night
+            if high_latitude == "one_seventh":
+                return night / 7
+            return night / 2
+
+        limit = portion(params["fajr"])
+        if math.isnan(fajr) or sunrise - fajr > limit:
+            fajr = sunrise - limit
+        if "isha_minutes" not in params:
+            limit = portion(params["isha"])
+            if math.isnan(isha) or isha - sunset > limit:
+                isha = sunset + limit
+    return fajr, sunrise, dhuhr, asr, sunset, isha
+
+
+def _julian_day(day):
+    return day.toordinal() + 1721424.5
+
+
+@lru_cache(maxsize=64)
+def compute_year(latitude, longitude, year, method=DEFAULT_CALC_METHOD, asr="standard",
+                 high_latitude=DEFAULT_HIGH_LATITUDE, time_zone="UTC"):
+    """Tableau annuel (même disposition que Timetable.minutes) des six prières.
+
+    Les heures sont converties dans le fuseau time_zone jour par jour, ce qui
+    tient compte des changements d'heure. Les années non bissextiles, le 29
+    février reprend les heures du 28. Le tableau renvoyé est partagé par le
+    cache : il ne doit pas être modifié. Un paramètre invalide lève
+    ValueError (voir check_parameters).
+    """
+    check_parameters(latitude, longitude, method, asr, high_latitude, time_zone)
+    params = METHODS[method]
+    asr_factor = ASR_FACTORS[asr]
+    zone = ZoneInfo(time_zone)
+    minutes = array("H", [NO_TIME]) * (DAYS_PER_YEAR * len(PRAYERS))
+    day = date(year, 1, 1)
+    while day.year == year:
+        midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        hours = _day_times(_julian_day(day) - longitude / (15 * 24), latitude, params, asr_factor, high_latitude)
+        base = day_index(day) * len(PRAYERS)
+        for index, hour in enumerate(hours):
+            if math.isnan(hour):
+                continue
+            utc = midnight + timedelta(minutes=round((hour - longitude / 15) * 60))
+            local = utc.astimezone(zone)
+            minutes[base + index] = local.hour * 60 + local.minute
+        day += timedelta(days=1)
+    if not calendar.isleap(year):
+        feb_28 = day_index(date(2000, 2, 28)) * len(PRAYERS)
+        minutes[feb_28 + len(PRAYERS):feb_28 + 2 * len(PRAYERS)] = minutes[feb_28:feb_28 + len(PRAYERS)]
+    return minutes
+
@@ -0,0 +1,223 @@
+"""Calendrier des prières de chaque ville.
+
+Les événements d'un mois sont calculés une seule fois par ville, toujours
+dans l'exécuteur, dans des listes triées par instant de début : une requête
+sur une plage n'est qu'une bisection suivie d'une tranche par mois touché.
+Le mois en cours et le suivant sont préparés à l'ajout de l'entité, à chaque
+changement de données et chaque jour à DATA_UPDATED : le changement de mois
+ne coûte alors aucun calcul. Les autres mois sont calculés à la première
+requête qui les touche.
+"""
+import sys
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_UPDATED, SIGNAL_CITIES_ADDED
+from .coordinator import compute_day
+from .events import ADHAN, EID, JUMUA, TARAWEEH, local_epoch
+from .shared import async_get_domain_data, async_migrate_unique_ids
+from .timetable import format_minutes
+
+# Événements affichés : les prières, pas les iqamas ni le lever du soleil
+CALENDAR_KINDS = frozenset((ADHAN, JUMUA, EID, TARAWEEH))
+
+# Durée d'un événement sans iqama plus tardive, en secondes
+MIN_DURATION = 10 * 60
+
+# Mois gardés en mémoire par ville
+MAX_MONTHS = 13
+
+
+class MonthEvents:
+    """Événements (début, fin, nom, iqama) d'une ville sur un mois, en secondes UTC."""
+
+    __slots__ = ("starts", "events", "longest")
+
+    def __init__(self, data, year, month, zone):
+        events = []
+        day = date(year, month, 1)
+        while day.month == month:
+            schedule = compute_day(data, day, zone)
+            for epoch, (_, kind, name) in zip(schedule.events.epochs, schedule.events.events):
+                if kind not in CALENDAR_KINDS:
+                    continue
+                iqama = schedule.iqama.get(name) if kind == ADHAN else None
+                end = local_epoch(day, iqama, zone) if iqama is not None else epoch
+                events.append((epoch, max(end, epoch + MIN_DURATION), name, iqama))
+            day += timedelta(days=1)
+        events.sort()
+        self.starts = [event[0] for event in events]
+        self.events = events
+        self.longest = max((event[1] - event[0] for event in events), default=0)
+
+    def between(self, start, end):
+        """Événements qui chevauchent [start, end[."""
+        first = bisect_left(self.starts, start - self.longest)
+        last = bisect_left(self.starts, end)
+        return [event for event in self.events[first:last] if event[1] > start]
+
+
+class PrayerCalendar(CoordinatorEntity, CalendarEntity):
+    """Les prières d'une ville, comme événements de calendrier."""
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+        self.city = coordinator.city
+        self._entity_name = sys.intern(f"{coordinator.city}_prayers")
+        self._unique_id = f"{coordinator.unique_key}_prayers"
+        self._months = {}
+        self._version = None
+
+    @property
+    def name(self):
+        return self._entity_name
+
+    @property
+    def unique_id(self):
+        """Identifiant unique pour cette entité."""
+        return self._unique_id
+
+    @property
+    def icon(self):
+        """Icon to display in the front end."""
+        return "mdi:calendar-clock"
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(async_dispatcher_connect(self.hass, DATA_UPDATED, self._async_preload))
+        self.hass.async_create_task(self._async_preload())
+
+    @callback
+    def _handle_coordinator_update(self):
+        if self.coordinator.city_data is not None and self._version != self.coordinator.version:
+            # Nouvelles données (ou ville chargée) : les mois sont recalculés
+            self.hass.async_create_task(self._async_preload())
+        super()._handle_coordinator_update()
+
+    def _check_version(self):
+        coordinator = self.coordinator
+        if self._version != coordinator.version:
+            # Nouvelles données : les mois calculés ne sont plus valables
+            self._months.clear()
+            self._version = coordinator.version
+
+    async def _async_load_months(self, keys):
+        """Calculer dans l'exécuteur les mois absents ; renvoie les mois demandés.
+
+        Rien n'est gardé si les données ont changé pendant le calcul.
+        """
+        coordinator = self.coordinator
+        self._check_version()
+        months = {key: self._months[key] for key in keys if key in self._months}
+        missing = [key for key in keys if key not in months]
+        if not missing:
+            return months
+        data, version, zone = coordinator.city_data, coordinator.version, coordinator.zone
+        built = await self.hass.async_add_executor_job(
+            lambda: {(year, month): MonthEvents(data, year, month, zone) for year, month in missing}
+        )
+        months.update(built)
+        if coordinator.version == version and self._version == version:
+            if len(self._months) + len(built) > MAX_MONTHS:
+                self._months.clear()
+            self._months.update(built)
+        return months
+
+    async def _async_preload(self):
+        """Préparer le mois en cours et le suivant ; oublier les mois passés."""
+        coordinator = self.coordinator
+        if coordinator.city_data is None:
+            return
+        self._check_version()
+        today = coordinator.today()
+        current = (today.year, today.month)
+        for key in [key for key in self._months if key < current]:
+            del self._months[key]
+        following = divmod(today.year * 12 + today.month, 12)
+        await self._async_load_months([current, (following[0], following[1] + 1)])
+        self.async_write_ha_state()
+
+    def _month_keys(self, start, end):
+        """Mois (année, mois) touchés par [start, end[, dans le fuseau de la ville."""
+        zone = self.coordinator.zone
+        first = datetime.fromtimestamp(start, zone)
+        last = datetime.fromtimestamp(end, zone)
+        return [
+            (index // 12, index % 12 + 1)
+            for index in range(first.year * 12 + first.month - 1, last.year * 12 + last.month)
+        ]
+
+    def _between(self, start, end, months):
+        """Événements qui chevauchent [start, end[, en secondes UTC, pris dans months.
+
+        Un mois absent (pas encore calculé) ne donne aucun événement.
+        """
+        events = []
+        for key in self._month_keys(start, end):
+            if key in months:
+                events.extend(months[key].between(start, end))
+        return events
+
+    def _calendar_event(self, start, end, name, iqama):
+        zone = self.coordinator.zone
+        return CalendarEvent(
+            start=datetime.fromtimestamp(start, zone),
+            end=datetime.fromtimestamp(end, zone),
+            summary=name,
+            description=f"Iqama : {format_minutes(iqama)}" if iqama is not None else None,
+            location=self.city,
+        )
+
+    @property
+    def event(self):
+        """L'événement en cours, sinon le prochain ; None tant que le mois n'est pas prêt."""
+        coordinator = self.coordinator
+        if coordinator.city_data is None or self._version != coordinator.version:
+            return None
+        now = int(dt_util.utcnow().timestamp())
+        events = self._between(now, now + 2 * 24 * 3600, self._months)
+        return self._calendar_event(*events[0]) if events else None
+
+    async def async_get_events(self, hass: HomeAssistant, start_date: datetime, end_date: datetime):
+        """Événements de la plage demandée ; les mois manquants sont calculés dans l'exécuteur."""
+        start, end = int(start_date.timestamp()), int(end_date.timestamp())
+        if self.coordinator.city_data is None or start >= end:
+            return []
+        months = await self._async_load_months(self._month_keys(start, end))
+        return [self._calendar_event(*event) for event in self._between(start, end, months)]
+
+async def async_setup_platform(hass: HomeAssistant, config, async_add_entities, discovery_info=None):
+    """Un calendrier par ville de la configuration YAML.
+
+    Les coordinateurs sont créés par la plateforme de capteurs ; les villes
+    ajoutées après ce chargement arrivent par SIGNAL_CITIES_ADDED.
+    """
+    domain_data = async_get_domain_data(hass)
+    # Les coordinateurs YAML sont indexés par ville, ceux des entrées par identifiant
+    existing = [
+        coordinator for key, coordinator in domain_data["coordinators"].items()
+        if key == coordinator.city
+    ]
+
+    @callback
+    def _async_add_cities(coordinators):
+        calendars = [PrayerCalendar(coordinator) for coordinator in coordinators]
+        async_add_entities(async_migrate_unique_ids(hass, "calendar", calendars))
+
+    if existing:
+        _async_add_cities(existing)
+
+    domain_data["unsub_calendar"] = async_dispatcher_connect(hass, SIGNAL_CITIES_ADDED, _async_add_cities)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
+    """Calendrier de la mosquée d'une entrée de configuration."""
+    coordinator = async_get_domain_data(hass)["coordinators"][entry.entry_id]
+    async_add_entities(async_migrate_unique_ids(hass, "calendar", [PrayerCalendar(coordinator)]))
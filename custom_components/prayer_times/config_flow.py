@@ -0,0 +1,108 @@
+"""Configuration par l'interface : une entrée par mosquée, et ses options."""
+import os
+
+import voluptuous as vol
+
+from homeassistant import config_entries
+from homeassistant.core import callback
+
+from .const import (
+    CONF_ANNOUNCEMENTS,
+    CONF_CITY,
+    CONF_DATA_DIR,
+    CONF_UPCOMING_LEAD,
+    DEFAULT_DATA_DIR,
+    DEFAULT_UPCOMING_LEAD,
+    DOMAIN,
+    MAX_UPCOMING_LEAD,
+)
+from .loader import list_cities
+
+
+class PrayerTimesConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
+    """Choisir le répertoire de données, puis la mosquée."""
+
+    VERSION = 1
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return PrayerTimesOptionsFlow(config_entry)
+
+    def __init__(self):
+        self._data_dir = DEFAULT_DATA_DIR
+        self._cities = []
+
+    async def async_step_user(self, user_input=None):
+        errors = {}
+        if user_input is not None:
+            data_dir = os.path.abspath(user_input[CONF_DATA_DIR])
+            try:
+                cities = await self.hass.async_add_executor_job(list_cities, data_dir)
+            except OSError:
+                errors[CONF_DATA_DIR] = "data_dir_not_found"
+            else:
+                if cities:
+                    self._data_dir = data_dir
+                    self._cities = cities
+                    return await self.async_step_city()
+                errors[CONF_DATA_DIR] = "no_cities"
+
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema({vol.Required(CONF_DATA_DIR, default=self._data_dir): str}),
+            errors=errors,
+        )
+
+    async def async_step_city(self, user_input=None):
+        if user_input is not None:
+            city = user_input[CONF_CITY]
+            await self.async_set_unique_id(f"{self._data_dir}:{city}")
+            self._abort_if_unique_id_configured()
+            return self.async_create_entry(title=city, data={CONF_CITY: city, CONF_DATA_DIR: self._data_dir})
+
+        return self.async_show_form(
+            step_id="city",
+            data_schema=vol.Schema({vol.Required(CONF_CITY): vol.In(self._cities)}),
+        )
+
+
+def parse_leads(text):
+    """"15, 5" en [15, 5] : minutes avant la prière, entre 1 et MAX_UPCOMING_LEAD."""
+    leads = [int(value) for value in text.replace(";", ",").split(",") if value.strip()]
+    if any(not 1 <= lead <= MAX_UPCOMING_LEAD for lead in leads):
+        raise ValueError("délai hors limites")
+    return sorted(set(leads), reverse=True)
+
+
+class PrayerTimesOptionsFlow(config_entries.OptionsFlow):
+    """Annonces sur le bus : activation et délais des annonces à l'avance."""
+
+    def __init__(self, config_entry):
+        # Gardée ici : config_entry n'est fourni par Home Assistant qu'à partir de 2024.11
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        errors = {}
+        options = self._entry.options
+        if user_input is not None:
+            try:
+                leads = parse_leads(user_input[CONF_UPCOMING_LEAD])
+            except ValueError:
+                errors[CONF_UPCOMING_LEAD] = "invalid_lead"
+            else:
+                return self.async_create_entry(
+                    data={CONF_ANNOUNCEMENTS: user_input[CONF_ANNOUNCEMENTS], CONF_UPCOMING_LEAD: leads}
+                )
+
+        leads = ", ".join(str(lead) for lead in options.get(CONF_UPCOMING_LEAD, DEFAULT_UPCOMING_LEAD))
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_ANNOUNCEMENTS, default=options.get(CONF_ANNOUNCEMENTS, True)): bool,
+                    vol.Required(CONF_UPCOMING_LEAD, default=leads): str,
+                }
+            ),
+            errors=errors,
+        )
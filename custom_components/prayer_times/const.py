@@ -1,5 +1,8 @@
 DOMAIN = "prayer_times"
 """Constants for the Islamic Prayer component."""
+import os
+from datetime import timedelta
+
 NAME = "Oissel Prayer Times"
 PRAYER_TIMES_ICON = "mdi:calendar-clock"
 PRAYER_JUMUA_ICON = "mdi:MosqueOutline"
@@ -31,8 +34,14 @@ SENSOR_TYPES = {
         
 CONF_CALC_METHOD = "calculation_method"
 
-CALC_METHODS = ["nearest", "farest"]
-DEFAULT_CALC_METHOD = "nearest"
+CALC_METHODS = ["MWL", "ISNA", "Egypt", "Makkah", "Karachi", "UOIF"]
+DEFAULT_CALC_METHOD = "MWL"
+
+# Position de la mosquée, pour calculer les horaires absents des fichiers
+LOCATION_FILE = "localisation.csv"
+
+# Prières datées d'une ville (Aïd, tarawih), voir special.py
+EVENTS_FILE = "evenements.csv"
 
 DATA_UPDATED = "Mawaqit_prayer_data_updated"
 
@@ -46,3 +55,47 @@ PASSWORD = "password"
 
 API = "api"
 CONF_UUID ="uuid"
+
+# Mosquées distantes (voir remote.py) et intervalle de leur rafraîchissement
+CONF_REMOTE = "remote"
+REMOTE_INTERVAL = timedelta(hours=6)
+
+# Cache binaire des fichiers analysés, dans le répertoire .storage
+CACHE_FILE = "prayer_times.cache"
+
+# Une entrée de configuration par mosquée : la ville et son répertoire de données
+CONF_CITY = "city"
+CONF_DATA_DIR = "data_dir"
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+PLATFORMS = ["sensor", "calendar"]
+
+# Fichier compilé d'une ville, dans data/<ville>/
+BINARY_FILE = "timetable.bin"
+
+# Liste des fichiers compilés et de leurs empreintes, dans data/
+MANIFEST_FILE = "manifest.json"
+
+# Intervalle de vérification des fichiers de données modifiés
+RELOAD_INTERVAL = timedelta(seconds=60)
+
+# Chargement paresseux : les horaires d'une ville ne sont lus qu'à l'ajout de
+# ses entités ou à la première requête, et libérés après idle_timeout secondes
+# sans utilisation
+CONF_LAZY_LOAD = "lazy_load"
+CONF_IDLE_TIMEOUT = "idle_timeout"
+DEFAULT_IDLE_TIMEOUT = timedelta(minutes=30)
+
+# Villes de la configuration YAML créées par la plateforme de capteurs,
+# annoncées aux autres plateformes (calendrier)
+SIGNAL_CITIES_ADDED = f"{DOMAIN}_cities_added"
+
+# Minutes avant la prochaine prière pour "Next Salat Preparation"
+NEXT_SALAT_PREPARATION = 15
+
+# Annonces sur le bus (voir announcements.py) : activées par défaut, avec
+# les délais en minutes des annonces à l'avance
+CONF_ANNOUNCEMENTS = "announcements"
+CONF_UPCOMING_LEAD = "upcoming_lead"
+DEFAULT_UPCOMING_LEAD = [NEXT_SALAT_PREPARATION]
+MAX_UPCOMING_LEAD = 180
@@ -0,0 +1,350 @@
+"""Calcul de l'horaire du jour, une seule fois par ville."""
+import logging
+import sys
+from datetime import datetime, timedelta
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+
+from .announcements import CityAnnouncer
+from .const import DOMAIN
+from .events import ADHAN, EID, IQAMA, JUMUA, SALAT, SHUROUQ, TARAWEEH, DayEvents, local_epoch, next_event_at
+from .snapshot import data_version
+from .stats import CityStats, Timer
+from .timetable import DATED_PRAYERS, FRIDAY_SLOTS, IQAMA_PRAYERS, PRAYERS
+
+_LOGGER = logging.getLogger(__name__)
+
+FRIDAY = 4
+
+# Type d'événement des prières datées
+_DATED_KINDS = {"Eid": EID, "Taraweeh": TARAWEEH}
+
+
+class DaySchedule:
+    """Horaire complet d'une ville pour un jour, en minutes depuis minuit.
+
+    friday contient les créneaux du vendredi (Jumua, Jumua 2) de ce jour si
+    c'est un vendredi, du vendredi suivant sinon ; special les prières datées
+    du jour (Eid, Taraweeh). Les instants UTC des événements sont calculés
+    ici, dans le fuseau de la ville, une seule fois pour la journée.
+    """
+
+    def __init__(self, day, adhan, iqama, friday, special, zone):
+        self.day = day
+        self.adhan = adhan
+        self.iqama = iqama
+        self.friday = friday
+        self.special = special
+        self.next_salat = None
+        self.next_salat_time = None
+        self.next_salat_remaining = None
+        self.next_salat_epoch = None
+        is_friday = day.weekday() == FRIDAY
+        events = [(minutes, IQAMA, prayer) for prayer, minutes in iqama.items()]
+        for prayer, minutes in adhan.items():
+            if prayer == "Shurouq":
+                events.append((minutes, SHUROUQ, prayer))
+            elif not (prayer == "Dhuhr" and is_friday and "Jumua" in friday):
+                # Le vendredi, Jumua remplace Dhuhr
+                events.append((minutes, ADHAN, prayer))
+        if is_friday:
+            events.extend((minutes, JUMUA, slot) for slot, minutes in friday.items())
+        events.extend((minutes, _DATED_KINDS[name], name) for name, minutes in special.items())
+        # Toutes les minutes où une valeur de la ville peut changer
+        self.events = DayEvents(day, events, zone)
+
+
+def is_for_year(timetable, year):
+    """Vrai si les horaires calculés et les prières datées valent pour year."""
+    return timetable.year in (None, year) and timetable.special_year in (None, year)
+
+
+def compute_day(data, day, zone):
+    """Construire l'horaire du jour à partir des données de la ville."""
+    adhan = {}
+    for prayer in PRAYERS:
+        minutes = data.timetable.get(day, prayer)
+        if minutes is not None:
+            adhan[prayer] = minutes
+    iqama = {}
+    for prayer in IQAMA_PRAYERS:
+        minutes = data.timetable.get_iqama(day, prayer)
+        if minutes is not None:
+            iqama[prayer] = minutes
+    # Créneaux du vendredi de la semaine : une lecture par créneau
+    friday_day = day + timedelta(days=(FRIDAY - day.weekday()) % 7)
+    friday = {}
+    for slot in FRIDAY_SLOTS:
+        minutes = data.timetable.get_special(friday_day, slot)
+        if minutes is not None:
+            friday[slot] = minutes
+    special = {}
+    for name in DATED_PRAYERS:
+        minutes = data.timetable.get_special(day, name)
+        if minutes is not None:
+            special[name] = minutes
+    return DaySchedule(day, adhan, iqama, friday, special, zone)
+
+
+def city_zone(data):
+    """Fuseau de la ville, celui de Home Assistant si elle n'en déclare pas."""
+    if data.time_zone:
+        zone = dt_util.get_time_zone(data.time_zone)
+        if zone is not None:
+            return zone
+        _LOGGER.warning("Fuseau horaire inconnu pour la ville %s : %s", data.city, data.time_zone)
+    return dt_util.DEFAULT_TIME_ZONE
+
+
+class PrayerTimesCoordinator(DataUpdateCoordinator):
+    """Horaire d'une ville, recalculé aux seules transitions.
+
+    Le calcul du jour est fait une fois par jour ; à chaque transition seule
+    la prochaine prière est recalculée, puis toutes les entités de la ville
+    sont notifiées ensemble.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        scheduler,
+        cache,
+        city,
+        data=None,
+        snapshot=None,
+        stats=None,
+        announce_leads=None,
+        unique_key=None,
+    ):
+        super().__init__(hass, _LOGGER, name=f"{DOMAIN}_{city}", update_interval=None)
+        self.scheduler = scheduler
+        self.cache = cache
+        # Clé internée, partagée par les noms des entités et les dictionnaires
+        self.city = sys.intern(city)
+        self.snapshot = snapshot
+        self.stats = stats.city(city) if stats is not None else CityStats()
+        self.snapshot_key = f"{cache.base_path}:{city}"
+        # Préfixe des unique_id : identifiant de l'entrée, ou répertoire:ville
+        # en YAML, pour qu'une même ville puisse venir de deux sources
+        self.unique_key = unique_key or self.snapshot_key
+        # None tant que la ville n'est pas chargée (chargement paresseux)
+        self.city_data = data
+        self.version = data_version(data) if data is not None else None
+        self.zone = city_zone(data) if data is not None else None
+        self._tomorrow = None
+        # (données, version) de l'année suivante, préparées par la tâche quotidienne
+        self._next_year = None
+        self._loading = False
+        # Annonces sur le bus, None si elles sont désactivées
+        self.announcer = CityAnnouncer(hass, scheduler, self.city, announce_leads) if announce_leads is not None else None
+
+    @property
+    def listener_count(self):
+        """Nombre d'entités qui écoutent la ville."""
+        return len(self._listeners)
+
+    @callback
+    def async_add_listener(self, update_callback, context=None):
+        """Garder la ville en mémoire tant qu'une entité l'écoute.
+
+        La première entité ajoutée déclenche le chargement d'une ville pas
+        encore lue ; une ville dont aucune entité n'est activée n'est jamais lue.
+        """
+        remove_listener = super().async_add_listener(update_callback, context)
+        if self.listener_count == 1:
+            self.cache.pin(self.city)
+            if self.city_data is None and not self._loading:
+                self._loading = True
+                self.hass.async_create_task(self._async_load())
+
+        @callback
+        def _remove_listener():
+            remove_listener()
+            if not self.listener_count:
+                # Plus aucune entité : la ville peut être libérée
+                self.async_cancel()
+                self.city_data = None
+                self.data = None
+                self._tomorrow = None
+                self._next_year = None
+                self.cache.unpin(self.city)
+
+        return _remove_listener
+
+    async def _async_load(self):
+        """Charger la ville, depuis l'instantané s'il existe, et calculer son horaire."""
+        try:
+            if self.async_restore():
+                self.hass.async_create_task(self.async_verify())
+                return
+            data = self.cache.get(self.city)
+            if data is None:
+                data = await self.hass.async_add_executor_job(self.cache.load, self.city)
+        finally:
+            self._loading = False
+        if not self.listener_count:
+            return
+        if not data.timetable or not data.timetable.has_iqama():
+            _LOGGER.error("Les données de prière ou d'iqama sont manquantes pour la ville : %s", self.city)
+            return
+        self.async_set_city_data(data)
+
+    @callback
+    def async_restore(self):
+        """Repartir de l'instantané enregistré ; faux s'il n'y en a pas.
+
+        L'horaire du jour enregistré est repris tel quel s'il est encore valable.
+        """
+        restored = self.snapshot.restore(self.snapshot_key, self.city) if self.snapshot else None
+        if restored is None:
+            return False
+        data, version, today = restored
+        if not data.timetable or not data.timetable.has_iqama():
+            return False
+        self.city_data = data
+        self.version = version
+        self.zone = city_zone(data)
+        self._tomorrow = None
+        self._next_year = None
+        self.data = None
+        if today is not None and today[0] == self.today():
+            self.data = DaySchedule(*today, self.zone)
+        self.async_refresh_schedule()
+        return True
+
+    async def async_verify(self, data=None):
+        """Relire les fichiers sources et remplacer l'instantané s'ils ont changé."""
+        if data is None:
+            data = await self.hass.async_add_executor_job(self.cache.load, self.city)
+        if self.city_data is None or not data.timetable or not data.timetable.has_iqama():
+            return
+        version = data_version(data)
+        if version == self.version:
+            # Mêmes horaires : seules les données en mémoire sont échangées
+            self.city_data = data
+            self.zone = city_zone(data)
+            return
+        _LOGGER.info("Données modifiées depuis l'instantané, ville : %s", self.city)
+        self.async_set_city_data(data, version)
+
+    @callback
+    def async_set_city_data(self, data, version=None):
+        """Remplacer les données de la ville et recalculer l'horaire."""
+        self.city_data = data
+        self.version = version or data_version(data)
+        self.zone = city_zone(data)
+        self.data = None
+        self._tomorrow = None
+        self._next_year = None
+        self.async_refresh_schedule()
+
+    @callback
+    def async_advance_day(self):
+        """Passer au jour courant si le réveil de minuit a été manqué.
+
+        Renvoie l'année dont les données sont à préparer si le lendemain n'est
+        pas dans l'année des données chargées, None sinon.
+        """
+        if self.city_data is None:
+            return None
+        today = self.today()
+        if self.data is None or self.data.day != today:
+            self.async_refresh_schedule()
+        year = (today + timedelta(days=1)).year
+        if is_for_year(self.city_data.timetable, year):
+            return None
+        if self._next_year is not None and is_for_year(self._next_year[0].timetable, year):
+            return None
+        return year
+
+    @callback
+    def async_set_next_year(self, data):
+        """Données de l'année suivante, échangées au changement de jour."""
+        version = data_version(data)
+        if is_for_year(data.timetable, self.today().year):
+            # Changement d'année déjà passé : échange immédiat
+            self.cache.replace(self.city, data)
+            self.async_set_city_data(data, version)
+            return
+        self._next_year = (data, version)
+        if self._tomorrow is not None:
+            # Le premier jour de l'année vient déjà des nouvelles données
+            self._tomorrow = compute_day(data, self._tomorrow.day, self.zone)
+
+    def today(self, timestamp=None):
+        """Date du jour dans le fuseau de la ville, pas dans celui de l'hôte."""
+        if timestamp is None:
+            timestamp = dt_util.utcnow().timestamp()
+        return datetime.fromtimestamp(timestamp, self.zone).date()
+
+    @callback
+    def async_refresh_schedule(self, now=None):
+        """Recalculer l'horaire, notifier les entités et planifier la suite."""
+        self.async_set_updated_data(self._async_compute_schedule())
+
+    @callback
+    def _async_compute_schedule(self):
+        """L'horaire du jour avec sa prochaine prière ; planifie le réveil suivant."""
+        with Timer(self.stats.compute):
+            timestamp = int(dt_util.utcnow().timestamp())
+            today = self.today(timestamp)
+            schedule = self.data
+            yesterday = None
+            if schedule is None or schedule.day != today:
+                if schedule is not None and schedule.day == today - timedelta(days=1):
+                    # Ses événements passés minuit (iqama de Isha) restent à annoncer
+                    yesterday = schedule
+                if self._next_year is not None and is_for_year(self._next_year[0].timetable, today.year):
+                    # Nouvelle année : données lues la veille par la tâche quotidienne
+                    self.city_data, self.version = self._next_year
+                    self._next_year = None
+                    self.cache.replace(self.city, self.city_data)
+                if self._tomorrow is not None and self._tomorrow.day == today:
+                    schedule = self._tomorrow
+                else:
+                    schedule = compute_day(self.city_data, today, self.zone)
+                self._tomorrow = None
+            if self._tomorrow is None:
+                # Nouveau jour ou nouvelles données : l'instantané et les annonces
+                # du jour sont mis à jour
+                self._tomorrow = compute_day(self.city_data, today + timedelta(days=1), self.zone)
+                if self.snapshot is not None:
+                    self.snapshot.async_update(self.snapshot_key, self.city_data, self.version, schedule)
+                if self.announcer is not None:
+                    self.announcer.async_set_day(schedule, self._tomorrow, self.zone, yesterday)
+            salat = next_event_at(schedule.events, self._tomorrow.events, timestamp, SALAT)
+            if salat is None:
+                schedule.next_salat = schedule.next_salat_time = None
+                schedule.next_salat_remaining = schedule.next_salat_epoch = None
+            else:
+                (
+                    schedule.next_salat_time,
+                    _,
+                    schedule.next_salat,
+                    schedule.next_salat_remaining,
+                    schedule.next_salat_epoch,
+                ) = salat
+
+        # Le changement de jour passe avant un événement d'après minuit
+        when = local_epoch(today + timedelta(days=1), 0, self.zone)
+        event = schedule.events.next_at(timestamp)
+        if event is not None:
+            when = min(event[0], when)
+        # Le coordinateur sert de clé : une même ville peut venir de deux répertoires
+        self.scheduler.async_schedule(self, when, self.async_refresh_schedule)
+        return schedule
+
+    @callback
+    def async_cancel(self):
+        """Annuler les réveils planifiés de la ville."""
+        self.scheduler.async_cancel(self)
+        if self.announcer is not None:
+            self.announcer.async_cancel()
+
+    async def _async_update_data(self):
+        if self.city_data is None:
+            return None
+        # Même horaire que les transitions : la prochaine prière reste renseignée
+        return self._async_compute_schedule()
@@ -0,0 +1,53 @@
+"""Tâche quotidienne de toutes les villes, à UPDATE_TIME.
+
+Chaque coordinateur passe au jour suivant à minuit avec l'horaire du
+lendemain, calculé la veille. Cette tâche, lancée une fois par jour en
+dehors des heures de prière :
+
+- rattrape un changement de jour manqué (mise en veille, horloge modifiée) ;
+- la veille du nouvel an, lit dans l'exécuteur les données de l'année
+  suivante (horaires calculés, Aïd, tarawih), échangées à minuit sans
+  aucune lecture ;
+- envoie DATA_UPDATED : les entités abonnées (calendriers) préparent alors
+  le mois suivant.
+"""
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .const import DATA_UPDATED
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def load_years(cache, requests):
+    """Lire les villes {(ville, année)} pour une autre année (appel bloquant)."""
+    loaded = {}
+    for city, year in requests:
+        try:
+            loaded[(city, year)] = cache.load_year(city, year)
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Données de %s non préparées pour la ville %s : %s", year, city, err)
+    return loaded
+
+
+async def async_daily_update(hass: HomeAssistant, domain_data, now=None):
+    """Jour courant et lendemain de chaque ville chargée, puis DATA_UPDATED."""
+    pending = {}
+    for coordinator in list(domain_data["coordinators"].values()):
+        year = coordinator.async_advance_day()
+        if year is not None:
+            pending.setdefault(coordinator.cache, []).append((coordinator, year))
+
+    # Une seule lecture par ville et par répertoire, même pour deux coordinateurs
+    for cache, coordinators in pending.items():
+        loaded = await hass.async_add_executor_job(
+            load_years, cache, {(coordinator.city, year) for coordinator, year in coordinators}
+        )
+        for coordinator, year in coordinators:
+            data = loaded.get((coordinator.city, year))
+            if data is not None and data.timetable and data.timetable.has_iqama():
+                coordinator.async_set_next_year(data)
+
+    async_dispatcher_send(hass, DATA_UPDATED)
@@ -0,0 +1,20 @@
+"""Téléchargement des diagnostics : coût des mises à jour et état des caches."""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .shared import async_get_domain_data
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Statistiques de la mosquée de l'entrée et des caches de données."""
+    domain_data = async_get_domain_data(hass)
+    coordinator = domain_data["coordinators"].get(entry.entry_id)
+    if coordinator is None:
+        return {"entry": dict(entry.data), "loaded": False}
+    return {
+        "entry": dict(entry.data),
+        "loaded": coordinator.city_data is not None,
+        "data_version": coordinator.version,
+        "listeners": coordinator.listener_count,
+        "stats": domain_data["stats"].as_dict(domain_data["caches"].values(), [coordinator.city]),
+    }
@@ -0,0 +1,77 @@
+"""Événements d'une journée, triés pour trouver le suivant par bisection.
+
+Les minutes sont l'heure locale de la ville, pour l'affichage. Avec un fuseau
+horaire, chaque événement a aussi son instant en secondes UTC depuis l'epoch,
+converti une fois par jour : les recherches comparent alors des entiers, et
+les jours de changement d'heure (23 ou 25 heures) restent justes.
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+ADHAN = "adhan"
+IQAMA = "iqama"
+JUMUA = "jumua"
+SHUROUQ = "shurouq"
+EID = "eid"
+TARAWEEH = "taraweeh"
+
+# Événements qui comptent comme une prière pour "Next Salat"
+SALAT = frozenset((ADHAN, JUMUA))
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def local_epoch(day, minute, zone):
+    """Secondes UTC depuis l'epoch de la minute locale d'un jour, dans zone.
+
+    Une heure qui n'existe pas (passage à l'heure d'été) est décalée d'une
+    heure en avant ; une heure vécue deux fois (passage à l'heure d'hiver)
+    est la première des deux. Une minute après minuit (une iqama de Isha
+    tardive) tombe le lendemain.
+    """
+    days, minute = divmod(minute, MINUTES_PER_DAY)
+    if days:
+        day += timedelta(days=days)
+    hour, minute = divmod(minute, 60)
+    return int(datetime(day.year, day.month, day.day, hour, minute, tzinfo=zone).timestamp())
+
+
+class DayEvents:
+    """Paires (minute, événement) d'un jour, triées par minute.
+
+    Une minute après minuit (MINUTES_PER_DAY ou plus, l'iqama d'un Isha
+    tardif) est gardée dans la liste du jour ; son instant tombe le
+    lendemain. Si zone est donné, epochs contient l'instant UTC de chaque
+    événement.
+    """
+
+    def __init__(self, day, events, zone=None):
+        events = sorted(event for event in events if event[0] >= 0)
+        self.day = day
+        self.minutes = [event[0] for event in events]
+        self.events = events
+        self.epochs = [local_epoch(day, minute, zone) for minute in self.minutes] if zone is not None else None
+
+    def next_at(self, timestamp, kinds=None):
+        """Premier événement strictement après l'instant timestamp : (epoch, événement) ou None."""
+        for index in range(bisect_right(self.epochs, timestamp), len(self.events)):
+            if kinds is None or self.events[index][1] in kinds:
+                return self.epochs[index], self.events[index]
+        return None
+
+
+def next_event_at(today, tomorrow, timestamp, kinds=None):
+    """Prochain événement après un instant en secondes UTC, en passant au lendemain si besoin.
+
+    Renvoie (minute, type, nom, minutes restantes, epoch) ou None ; les
+    minutes restantes sont arrondies au-dessus et comptent l'heure gagnée ou
+    perdue un jour de changement d'heure.
+    """
+    found = today.next_at(timestamp, kinds)
+    if found is None and tomorrow is not None:
+        found = tomorrow.next_at(timestamp, kinds)
+    if found is None:
+        return None
+    epoch, event = found
+    return (*event, -((timestamp - epoch) // 60), epoch)
+
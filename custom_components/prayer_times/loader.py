@@ -0,0 +1,473 @@
+"""Chargement des données des villes hors de la boucle d'événements."""
+import csv
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import date
+
+from .binary import is_fresh, read_city_binary, read_manifest
+from .cache import FileCache, read_file
+from .calc import DEFAULT_HIGH_LATITUDE, check_parameters, compute_year
+from .const import BINARY_FILE, CONF_CALC_METHOD, DEFAULT_CALC_METHOD, EVENTS_FILE, LOCATION_FILE, MANIFEST_FILE
+from .special import compile_special, get_zone, parse_events, parse_friday
+from .stats import Timer
+from .timetable import NO_TIME, SPECIAL, compile_iqama, parse_iqama, read_timetable
+
+_LOGGER = logging.getLogger(__name__)
+
+# Nombre de villes sans entité active gardées en mémoire
+MAX_IDLE_CITIES = 8
+
+
+class CityData:
+    """Données d'une ville, lues une seule fois."""
+
+    def __init__(self, city, timetable, iqama_rules, time_zone=None):
+        self.city = city
+        self.timetable = timetable
+        self.iqama_rules = iqama_rules
+        # Fuseau de la mosquée (localisation.csv), celui de Home Assistant à défaut
+        self.time_zone = time_zone
+
+
+def read_iqama_rules(city_path, read=read_file):
+    filename = os.path.join(city_path, "iqama.csv")
+    _LOGGER.debug("Lecture des temps d'iqama depuis : %s", filename)
+    try:
+        return read(filename, parse_iqama)
+    except FileNotFoundError:
+        _LOGGER.error("Fichier non trouvé : %s", filename)
+        return ()
+    except ValueError as err:
+        # Sans iqama, la ville est signalée puis ignorée ; les autres se chargent
+        _LOGGER.error("Fichier d'iqama invalide, %s : %s", err, filename)
+        return ()
+
+
+def _read_rules(filename, parser, read):
+    """Règles facultatives d'un fichier : () s'il est absent ou invalide."""
+    try:
+        return read(filename, parser)
+    except FileNotFoundError:
+        return ()
+    except ValueError as err:
+        # RuleError : la ligne fautive est signalée, la ville se charge sans ces règles
+        _LOGGER.error("Fichier de règles invalide (%s) : %s", err, filename)
+        return ()
+
+
+def read_friday_rules(city_path, read=read_file):
+    filename = os.path.join(city_path, "vendredi.csv")
+    _LOGGER.debug("Lecture des prières du vendredi depuis : %s", filename)
+    return _read_rules(filename, parse_friday, read)
+
+
+def read_events(city_path, read=read_file):
+    filename = os.path.join(city_path, EVENTS_FILE)
+    _LOGGER.debug("Lecture des prières datées depuis : %s", filename)
+    return _read_rules(filename, parse_events, read)
+
+
+def read_special_names(city_path, read=read_file):
+    """Horaires particuliers déclarés par une ville, sans lire ses horaires."""
+    names = {SPECIAL[rule[0]] for rule in read_friday_rules(city_path, read)}
+    names.update(SPECIAL[rule[0]] for rule in read_events(city_path, read))
+    return tuple(name for name in SPECIAL if name in names)
+
+
+def parse_location(text):
+    """localisation.csv : position et paramètres du calcul astronomique.
+
+    Une méthode, un asr, une règle high_latitude ou un fuseau inconnus lèvent
+    ValueError : la ville est signalée, les autres se chargent.
+    """
+    row = next(csv.DictReader(io.StringIO(text)), None)
+    if row is None:
+        return None
+    location = {
+        "latitude": float(row["latitude"]),
+        "longitude": float(row["longitude"]),
+        "method": (row.get(CONF_CALC_METHOD) or "").strip() or DEFAULT_CALC_METHOD,
+        "asr": (row.get("asr") or "").strip() or "standard",
+        "high_latitude": (row.get("high_latitude") or "").strip() or DEFAULT_HIGH_LATITUDE,
+        "time_zone": (row.get("timezone") or "").strip() or None,
+    }
+    check_parameters(
+        location["latitude"],
+        location["longitude"],
+        location["method"],
+        location["asr"],
+        location["high_latitude"],
+        location["time_zone"] or "UTC",
+    )
+    return location
+
+
+def read_location(city_path, read=read_file):
+    filename = os.path.join(city_path, LOCATION_FILE)
+    try:
+        return read(filename, parse_location)
+    except FileNotFoundError:
+        return None
+    except (KeyError, ValueError) as err:
+        _LOGGER.error("Fichier de localisation invalide (%s) : %s", err, filename)
+        return None
+
+
+def city_files(city_path):
+    """Fichiers CSV dont dépendent les données d'une ville."""
+    return [os.path.join(city_path, f"{month:02}.csv") for month in range(1, 13)] + [
+        os.path.join(city_path, "iqama.csv"),
+        os.path.join(city_path, "vendredi.csv"),
+        os.path.join(city_path, EVENTS_FILE),
+        os.path.join(city_path, LOCATION_FILE),
+    ]
+
+
+def list_cities(base_path):
+    """Noms des répertoires de villes sous base_path."""
+    return sorted(name for name in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, name)))
+
+
+def city_index(base_path, read=read_file):
+    """Index léger des villes, sans lire leurs horaires : {ville: horaires particuliers}.
+
+    Seuls les petits fichiers de règles (vendredi.csv, evenements.csv) sont lus.
+    """
+    return {city: read_special_names(os.path.join(base_path, city), read) for city in list_cities(base_path)}
+
+
+def load_manifest(base_path):
+    """Empreintes du manifeste de build.py, ou {} s'il est absent ou invalide."""
+    path = os.path.join(base_path, MANIFEST_FILE)
+    try:
+        return read_manifest(path)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as err:
+        _LOGGER.warning("Manifeste ignoré (%s) : %s", err, path)
+        return {}
+
+
+def load_city(base_path, city, read=read_file, time_zone=None, manifest=None, year=None):
+    """Lire tous les fichiers d'une ville (appel bloquant).
+
+    Une ville listée dans le manifeste est chargée depuis son fichier compilé,
+    vérifié par son empreinte, sans consulter les CSV. Sinon le fichier
+    binaire est utilisé s'il est plus récent que les CSV, et les CSV à défaut.
+    Les prières datées sont celles de year (l'année en cours par défaut) :
+    pour un fichier compilé une autre année, seules elles sont recalculées.
+    Les horaires calculés (localisation.csv) d'une autre année sont refaits
+    depuis les sources, avec leurs iqamas.
+    """
+    year = year or date.today().year
+    city_path = os.path.join(base_path, city)
+    binary_path = os.path.join(city_path, BINARY_FILE)
+    expected = manifest.get(city) if manifest else None
+    if expected is not None or is_fresh(binary_path, city_files(city_path)):
+        try:
+            timetable = read_city_binary(binary_path, city, expected)
+            location = read_location(city_path, read)
+            zone_name = location and location["time_zone"]
+            if location is not None and timetable.year != year:
+                _LOGGER.debug("Horaires recalculés pour %s : %s", year, binary_path)
+                return load_csv_city(city_path, city, read, time_zone, year)
+            if timetable.special_year not in (None, year):
+                _LOGGER.debug("Prières datées recalculées pour %s : %s", year, binary_path)
+                timetable.special, timetable.special_year = compile_special(
+                    timetable.minutes,
+                    read_friday_rules(city_path, read),
+                    read_events(city_path, read),
+                    year,
+                    get_zone(zone_name or time_zone),
+                    timetable.special,
+                )
+            return CityData(city, timetable, None, zone_name)
+        except (OSError, ValueError, KeyError) as err:
+            _LOGGER.warning("Fichier binaire ignoré (%s) : %s", err, binary_path)
+    return load_csv_city(city_path, city, read, time_zone, year)
+
+
+def load_csv_city(city_path, city, read=read_file, time_zone=None, year=None):
+    """Lire les fichiers CSV d'une ville (appel bloquant).
+
+    Si localisation.csv est présent, les jours absents des fichiers mensuels
+    sont calculés pour year, l'année en cours par défaut.
+    """
+    year = year or date.today().year
+    location = read_location(city_path, read)
+    timetable = read_timetable(city_path, city, read, required=location is None)
+    if location is not None:
+        # Même sans jour manquant cette année, l'année suivante est à recalculer
+        timetable.year = year
+    if location is not None and NO_TIME in timetable.minutes:
+        _LOGGER.debug("Calcul des horaires manquants pour la ville : %s (%s)", city, year)
+        computed = compute_year(
+            location["latitude"],
+            location["longitude"],
+            year,
+            location["method"],
+            location["asr"],
+            location["high_latitude"],
+            location["time_zone"] or time_zone or "UTC",
+        )
+        for index, value in enumerate(timetable.minutes):
+            if value == NO_TIME:
+                timetable.minutes[index] = computed[index]
+    iqama_rules = read_iqama_rules(city_path, read)
+    # Les iqamas de toute l'année sont calculées ici, une fois pour toutes
+    timetable.iqama = compile_iqama(timetable.minutes, iqama_rules)
+    # De même pour le vendredi, l'Aïd et les tarawih
+    zone_name = location and location["time_zone"]
+    timetable.special, timetable.special_year = compile_special(
+        timetable.minutes,
+        read_friday_rules(city_path, read),
+        read_events(city_path, read),
+        year,
+        get_zone(zone_name or time_zone),
+    )
+    return CityData(city, timetable, iqama_rules, zone_name)
+
+
+def load_cities(base_path, read=read_file, time_zone=None):
+    """Lire toutes les villes en un seul passage (appel bloquant)."""
+    manifest = load_manifest(base_path)
+    return {city: load_city(base_path, city, read, time_zone, manifest) for city in list_cities(base_path)}
+
+
+class TimetableStore:
+    """Tableaux d'horaires partagés par contenu entre toutes les villes chargées.
+
+    Deux mosquées aux horaires identiques (même ville dans deux répertoires,
+    ou villes voisines) partagent les mêmes tableaux en mémoire. Un tableau
+    disparaît du magasin quand plus aucune ville ne l'utilise.
+    """
+
+    def __init__(self):
+        self._arrays = weakref.WeakValueDictionary()
+
+    def share(self, values):
+        """Le tableau déjà connu de même contenu, sinon values."""
+        key = hashlib.sha1(values).digest()
+        shared = self._arrays.get(key)
+        if shared is None:
+            self._arrays[key] = shared = values
+        return shared
+
+    def share_city(self, data):
+        timetable = data.timetable
+        timetable.minutes = self.share(timetable.minutes)
+        timetable.iqama = self.share(timetable.iqama)
+        timetable.special = self.share(timetable.special)
+        return data
+
+    def __len__(self):
+        return len(self._arrays)
+
+
+class CityCache:
+    """Villes chargées, avec éviction LRU de celles sans entité active.
+
+    Les méthodes sans préfixe async font des entrées/sorties et doivent être
+    appelées dans l'exécuteur, éventuellement depuis plusieurs fils à la
+    fois : les villes en mémoire sont protégées par un verrou, jamais tenu
+    pendant une lecture de fichier. Le cache des fichiers n'est pas
+    enregistré à chaque chargement mais par lot (load_all) et par
+    reload_changed, appelé à intervalle régulier.
+    """
+
+    def __init__(self, base_path, cache_file=None, max_idle=MAX_IDLE_CITIES, time_zone=None, store=None, stats=None):
+        self.base_path = base_path
+        self.store = store
+        # PrayerStats facultatif : durée de chargement de chaque ville
+        self.stats = stats
+        self.time_zone = time_zone
+        self.cache_file = cache_file
+        self.max_idle = max_idle
+        self.files = FileCache()
+        self._cities = OrderedDict()
+        # Dernière utilisation de chaque ville chargée (time.monotonic)
+        self._used = {}
+        self._pins = {}
+        self._lock = threading.RLock()
+        self._restore_lock = threading.Lock()
+        self._restored = False
+        self._manifest = None
+        # Villes trouvées en mémoire ou à charger (voir stats.py)
+        self.hits = 0
+        self.misses = 0
+
+    def list(self):
+        """Villes disponibles sous base_path (appel bloquant)."""
+        return list_cities(self.base_path)
+
+    def index(self):
+        """Index léger des villes disponibles (appel bloquant)."""
+        return city_index(self.base_path, self.files.read)
+
+    def get(self, city):
+        """Données déjà chargées de la ville, ou None."""
+        with self._lock:
+            data = self._cities.get(city)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._cities.move_to_end(city)
+            self._used[city] = time.monotonic()
+            return data
+
+    def load(self, city):
+        """Charger une ville en ne réanalysant que les fichiers modifiés."""
+        self._restore()
+        data = self._load(city)
+        self._evict()
+        return data
+
+    def _restore(self):
+        """Relire une seule fois le cache enregistré."""
+        with self._restore_lock:
+            if self.cache_file and not self._restored:
+                self.files.load(self.cache_file)
+                self._restored = True
+
+    def manifest(self):
+        """Manifeste de build.py, relu quand il change (appel bloquant)."""
+        path = os.path.join(self.base_path, MANIFEST_FILE)
+        if self._manifest is None or self.files.is_stale(path):
+            self._manifest = load_manifest(self.base_path)
+            self.files.track(path)
+        return self._manifest
+
+    def _paths(self, city):
+        """Fichiers surveillés d'une ville : le binaire et ses règles si elle est au manifeste."""
+        city_path = os.path.join(self.base_path, city)
+        binary_path = os.path.join(city_path, BINARY_FILE)
+        if city in self.manifest():
+            # Règles relues quand l'année ne correspond plus au fichier compilé
+            return [binary_path, os.path.join(city_path, "vendredi.csv"), os.path.join(city_path, EVENTS_FILE)]
+        return [*city_files(city_path), binary_path]
+
+    def _load(self, city):
+        with Timer(self.stats.city(city).load if self.stats is not None else None):
+            data = load_city(self.base_path, city, self.files.read, self.time_zone, self.manifest())
+            if self.store is not None:
+                data = self.store.share_city(data)
+            # Les fichiers non analysés (binaire, ou CSV couverts par le binaire)
+            # sont tout de même surveillés
+            for path in self._paths(city):
+                self.files.track(path)
+            with self._lock:
+                self._cities[city] = data
+                self._cities.move_to_end(city)
+                self._used[city] = time.monotonic()
+        return data
+
+    def load_year(self, city, year):
+        """Données de la ville pour l'année year, sans les garder en mémoire (appel bloquant).
+
+        Sert à préparer le changement d'année : voir daily.py.
+        """
+        data = load_city(self.base_path, city, self.files.read, self.time_zone, self.manifest(), year)
+        return self.store.share_city(data) if self.store is not None else data
+
+    def read_many(self, cities):
+        """Données de plusieurs villes en un seul passage (appel bloquant).
+
+        Les villes déjà chargées sont prises telles quelles ; les autres sont
+        lues sans être gardées en mémoire, et le cache n'est enregistré
+        qu'une fois. Sert aux requêtes ponctuelles : voir services.py.
+        """
+        self._restore()
+        found = {}
+        for city in cities:
+            with self._lock:
+                data = self._cities.get(city)
+            if data is None:
+                data = load_city(self.base_path, city, self.files.read, self.time_zone, self.manifest())
+                if self.store is not None:
+                    data = self.store.share_city(data)
+            found[city] = data
+        self.save()
+        return found
+
+    def replace(self, city, data):
+        """Remplacer les données d'une ville déjà chargée, sans entrée/sortie."""
+        with self._lock:
+            if city in self._cities:
+                self._cities[city] = data
+
+    def load_all(self):
+        """Charger toutes les villes et enregistrer le cache.
+
+        Aucune éviction ici : les entités créées ensuite épinglent leur ville.
+        """
+        self._restore()
+        cities = {city: self._load(city) for city in list_cities(self.base_path)}
+        self.save()
+        return cities
+
+    def reload_changed(self):
+        """Recharger les villes dont un fichier a changé depuis sa lecture.
+
+        Les villes épinglées sont comprises même si elles ne sont plus en
+        mémoire : une ville évincée entre son chargement et l'ajout de ses
+        entités est ainsi rechargée comme les autres.
+        """
+        changed = {}
+        previous = self._manifest
+        # Un nouveau manifeste fait recharger toutes les villes
+        rebuilt = self.manifest() is not previous
+        with self._lock:
+            cities = list(self._cities)
+            cities.extend(city for city in self._pins if city not in self._cities)
+        for city in cities:
+            if rebuilt or any(self.files.is_stale(path) for path in self._paths(city)):
+                _LOGGER.info("Données modifiées, rechargement de la ville : %s", city)
+                changed[city] = self._load(city)
+        # Enregistre aussi les chargements isolés faits depuis le dernier passage
+        self.save()
+        return changed
+
+    def save(self):
+        """Enregistrer le cache ; en cas d'échec, il sera réécrit au prochain passage."""
+        if not self.cache_file:
+            return
+        try:
+            self.files.save(self.cache_file)
+        except OSError as err:
+            _LOGGER.warning("Cache non enregistré : %s (%s)", self.cache_file, err)
+
+    def pin(self, city):
+        """Empêcher l'éviction d'une ville qui a des entités actives."""
+        with self._lock:
+            self._pins[city] = self._pins.get(city, 0) + 1
+
+    def unpin(self, city):
+        with self._lock:
+            count = self._pins.get(city, 0) - 1
+            if count > 0:
+                self._pins[city] = count
+            else:
+                self._pins.pop(city, None)
+                self._evict()
+
+    def evict_idle(self, timeout):
+        """Libérer les villes sans entité active inutilisées depuis timeout secondes."""
+        limit = time.monotonic() - timeout
+        with self._lock:
+            for city in [city for city in self._cities if city not in self._pins and self._used[city] < limit]:
+                _LOGGER.debug("Éviction de la ville inutilisée : %s", city)
+                del self._cities[city]
+                del self._used[city]
+
+    def _evict(self):
+        with self._lock:
+            idle = [city for city in self._cities if city not in self._pins]
+            for city in idle[:max(len(idle) - self.max_idle, 0)]:
+                _LOGGER.debug("Éviction de la ville : %s", city)
+                del self._cities[city]
+                del self._used[city]
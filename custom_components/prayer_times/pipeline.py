@@ -0,0 +1,337 @@
+"""Validation et normalisation d'horaires bruts de mosquées.
+
+Usage :
+    python -m custom_components.prayer_times.pipeline validate SOURCE [...]
+    python -m custom_components.prayer_times.pipeline normalize SOURCE [...] --out DIR [--years 2025-2026]
+
+Une SOURCE est un répertoire de ville (tous ses .csv et .json sauf iqama,
+vendredi, evenements et localisation) ou un fichier isolé, dont le nom
+donne la ville. Les iqama.csv, vendredi.csv et evenements.csv d'un
+répertoire sont aussi vérifiés (délais, heures et périodes).
+Formats lus :
+
+- CSV avec une colonne date ("MM-JJ", "AAAA-MM-JJ" ou "JJ/MM/AAAA") et une
+  colonne par prière, séparateur ",", ";" ou tabulation ;
+- JSON au format calendrier Mawaqit : {"calendar": [{"1": [six heures]}, ...]}
+  avec un objet par mois.
+
+Les lignes sont lues en flux et chaque erreur est signalée avec son fichier
+et sa ligne. Les villes sont traitées en parallèle, une par processus.
+"""
+import argparse
+import calendar
+import contextlib
+import csv
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .special import parse_events, parse_friday
+from .timetable import PRAYERS, RuleError, parse_iqama
+
+IGNORED_FILES = {"iqama.csv", "vendredi.csv", "evenements.csv", "localisation.csv"}
+
+# Autres noms de colonnes rencontrés dans les horaires publiés
+_ALIASES = {
+    "fajr": "Fajr", "fajer": "Fajr", "sobh": "Fajr", "subh": "Fajr",
+    "shurouq": "Shurouq", "shuruq": "Shurouq", "chourouk": "Shurouq", "sunrise": "Shurouq",
+    "dhuhr": "Dhuhr", "dohr": "Dhuhr", "zuhr": "Dhuhr", "duhr": "Dhuhr",
+    "asr": "Asr",
+    "maghrib": "Maghrib", "maghreb": "Maghrib",
+    "isha": "Isha", "icha": "Isha",
+}
+
+
+class RowError:
+    """Erreur rattachée à une ligne d'un fichier source."""
+
+    __slots__ = ("source", "line", "message")
+
+    def __init__(self, source, line, message):
+        self.source = source
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        return f"{self.source}:{self.line}: {self.message}"
+
+
+def parse_clock(value):
+    """Minutes depuis minuit pour "HH:MM" ; ValueError sinon."""
+    hours, separator, minutes = value.strip().partition(":")
+    if not separator or not hours.isdigit() or len(minutes) != 2 or not minutes.isdigit():
+        raise ValueError(f"heure invalide : {value!r}")
+    hours, minutes = int(hours), int(minutes)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"heure hors limites : {value!r}")
+    return hours * 60 + minutes
+
+
+def parse_date(value):
+    """(année ou None, mois, jour) pour "MM-JJ", "AAAA-MM-JJ" ou "JJ/MM/AAAA"."""
+    value = value.strip()
+    if "/" in value:
+        parts = value.split("/")
+        if len(parts) != 3:
+            raise ValueError(f"date invalide : {value!r}")
+        year, month, day = int(parts[2]), int(parts[1]), int(parts[0])
+    else:
+        parts = value.split("-")
+        if len(parts) == 2:
+            year, month, day = None, int(parts[0]), int(parts[1])
+        elif len(parts) == 3:
+            year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
+        else:
+            raise ValueError(f"date invalide : {value!r}")
+    if not 1 <= month <= 12:
+        raise ValueError(f"mois invalide : {value!r}")
+    if not 1 <= day <= calendar.monthrange(year if year is not None else 2000, month)[1]:
+        raise ValueError(f"jour invalide : {value!r}")
+    return year, month, day
+
+
+def _csv_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        sample = file.readline()
+        file.seek(0)
+        delimiter = max((",", ";", "\t"), key=sample.count)
+        reader = csv.reader(file, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = {}
+        for index, name in enumerate(header):
+            key = name.strip().lower()
+            if key == "date":
+                columns["date"] = index
+            elif key in _ALIASES:
+                columns[_ALIASES[key]] = index
+        missing = [name for name in ("date", *PRAYERS) if name not in columns]
+        if missing:
+            yield 1, None, f"colonnes absentes : {', '.join(missing)}"
+            return
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            try:
+                yield reader.line_num, row[columns["date"]], [row[columns[prayer]] for prayer in PRAYERS]
+            except IndexError:
+                yield reader.line_num, None, "ligne incomplète"
+
+
+def _json_rows(path):
+    with open(path, encoding="utf-8") as file:
+        document = json.load(file)
+    yield from calendar_rows(document)
+
+
+def calendar_rows(document):
+    """Lignes d'un calendrier au format Mawaqit, déjà décodé (voir remote.py)."""
+    months = document.get("calendar") if isinstance(document, dict) else None
+    if not isinstance(months, list) or len(months) != 12:
+        yield 0, None, "calendrier JSON attendu : 12 mois"
+        return
+    for month, days in enumerate(months, start=1):
+        for day, times in days.items():
+            if not isinstance(times, list) or len(times) != len(PRAYERS):
+                yield month, None, f"jour {day} : {len(PRAYERS)} heures attendues"
+                continue
+            yield month, f"{month:02}-{int(day):02}", times
+
+
+def iter_rows(path):
+    """Lignes brutes d'un fichier : (ligne, date, heures) ou (ligne, None, erreur)."""
+    if path.endswith(".json"):
+        return _json_rows(path)
+    return _csv_rows(path)
+
+
+def validate_rows(source, rows, errors):
+    """Valider des lignes brutes ; renvoie ((année, mois, jour), minutes) valides.
+
+    Contrôles : format des dates et des heures, ordre croissant des prières
+    d'un jour (Isha peut passer minuit), doublons.
+    """
+    seen = {}
+    for line, date, values in rows:
+        if date is None:
+            errors.append(RowError(source, line, values))
+            continue
+        try:
+            key = parse_date(date)
+            minutes = [parse_clock(value) for value in values]
+        except ValueError as err:
+            errors.append(RowError(source, line, str(err)))
+            continue
+        if minutes[-1] < minutes[0]:
+            # Isha après minuit, aux hautes latitudes
+            minutes[-1] += 24 * 60
+        if any(earlier >= later for earlier, later in zip(minutes, minutes[1:])):
+            errors.append(RowError(source, line, "heures non croissantes dans la journée"))
+            continue
+        if key in seen:
+            errors.append(RowError(source, line, f"date en double (ligne {seen[key]})"))
+            continue
+        seen[key] = line
+        yield key, [value % (24 * 60) for value in minutes]
+
+
+def check_day_counts(source, days, errors):
+    """Vérifier que chaque mois présent est complet."""
+    counts = {}
+    for year, month, _ in days:
+        counts[(year, month)] = counts.get((year, month), 0) + 1
+    for (year, month), count in sorted(counts.items(), key=lambda item: (item[0][0] or 0, item[0][1])):
+        expected = calendar.monthrange(year if year is not None else 2001, month)[1]
+        if count not in (expected, 29 if year is None and month == 2 else expected):
+            label = f"{year}-{month:02}" if year is not None else f"{month:02}"
+            errors.append(RowError(source, 0, f"mois {label} : {count} jours au lieu de {expected}"))
+
+
+def check_rules(path, parser, errors):
+    """Vérifier un fichier de règles (iqama.csv, vendredi.csv...), s'il existe."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            parser(file.read())
+    except FileNotFoundError:
+        return
+    except RuleError as err:
+        errors.append(RowError(path, err.line, err.message))
+    except (OSError, ValueError) as err:
+        errors.append(RowError(path, 0, str(err)))
+
+
+def source_files(source):
+    """Fichiers d'horaires d'une source (répertoire de ville ou fichier)."""
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name)
+            for name in os.listdir(source)
+            if name.endswith((".csv", ".json")) and name not in IGNORED_FILES
+        )
+    return [source]
+
+
+def city_name(source):
+    return os.path.basename(os.path.normpath(source)) if os.path.isdir(source) else os.path.splitext(os.path.basename(source))[0]
+
+
+def write_city(path, days):
+    """Écrire les fichiers MM.csv d'une ville à partir de {(mois, jour): minutes}.
+
+    Chaque mois est d'abord écrit sous un nom temporaire ; les fichiers ne
+    sont remplacés qu'une fois tous écrits, d'un coup chacun : un lecteur ne
+    voit jamais de fichier à moitié écrit.
+    """
+    os.makedirs(path, exist_ok=True)
+    written = []
+    try:
+        for month in range(1, 13):
+            rows = sorted((key, minutes) for key, minutes in days.items() if key[0] == month)
+            if not rows:
+                continue
+            descriptor, temp = tempfile.mkstemp(prefix=f"{month:02}.csv.", dir=path)
+            written.append((temp, os.path.join(path, f"{month:02}.csv")))
+            with os.fdopen(descriptor, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(("date", *PRAYERS))
+                for (month_, day), minutes in rows:
+                    writer.writerow((f"{month_:02}-{day:02}", *(f"{value // 60:02}:{value % 60:02}" for value in minutes)))
+    except OSError:
+        for temp, _ in written:
+            with contextlib.suppress(OSError):
+                os.unlink(temp)
+        raise
+    for temp, target in written:
+        os.replace(temp, target)
+
+
+def normalize(days, years):
+    """Répartir les jours par année cible, au format de l'intégration.
+
+    Les jours sans année valent pour toutes les années ; le 29 février absent
+    est repris du 28 pour que les années bissextiles soient complètes.
+    Renvoie {année ou None: {(mois, jour): minutes}}.
+    """
+    generic = {(month, day): minutes for (year, month, day), minutes in days.items() if year is None}
+    dated = {}
+    for (year, month, day), minutes in days.items():
+        if year is not None and (years is None or year in years):
+            dated.setdefault(year, {})[(month, day)] = minutes
+    result = {}
+    if generic:
+        if (2, 29) not in generic and (2, 28) in generic:
+            generic[(2, 29)] = generic[(2, 28)]
+        if years is None:
+            result[None] = generic
+        else:
+            for year in years:
+                result[year] = {**generic, **dated.get(year, {})}
+    for year, year_days in dated.items():
+        if year not in result:
+            result[year] = year_days
+        if calendar.isleap(year) and (2, 29) not in year_days and (2, 28) in year_days:
+            year_days[(2, 29)] = year_days[(2, 28)]
+    return result
+
+
+def process_city(source, out=None, years=None, partial=False):
+    """Lire, valider et éventuellement écrire une ville ; renvoie (ville, jours, erreurs).
+
+    partial : les jours absents sont calculés (localisation.csv), les mois
+    incomplets sont admis.
+    """
+    city = city_name(source)
+    errors = []
+    days = {}
+    for path in source_files(source):
+        try:
+            for key, minutes in validate_rows(path, iter_rows(path), errors):
+                days[key] = minutes
+        except (OSError, ValueError, UnicodeDecodeError) as err:
+            errors.append(RowError(path, 0, str(err)))
+    if not partial:
+        check_day_counts(source, days, errors)
+    if os.path.isdir(source):
+        for name, parser in (("iqama.csv", parse_iqama), ("vendredi.csv", parse_friday), ("evenements.csv", parse_events)):
+            check_rules(os.path.join(source, name), parser, errors)
+    if out is not None and days:
+        for year, year_days in normalize(days, years).items():
+            target = os.path.join(out, str(year), city) if year is not None else os.path.join(out, city)
+            write_city(target, year_days)
+    return city, len(days), [str(error) for error in errors]
+
+
+def parse_years(value):
+    first, _, last = value.partition("-")
+    return range(int(first), int(last or first) + 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valider et normaliser des horaires de mosquées.")
+    parser.add_argument("command", choices=("validate", "normalize"))
+    parser.add_argument("sources", nargs="+", help="répertoires de villes ou fichiers")
+    parser.add_argument("--out", help="répertoire data/ de sortie (normalize)")
+    parser.add_argument("--years", type=parse_years, help="années cibles, par exemple 2025-2027")
+    parser.add_argument("--jobs", type=int, default=None, help="nombre de processus")
+    args = parser.parse_args(argv)
+    if args.command == "normalize" and not args.out:
+        parser.error("normalize demande --out")
+
+    out = args.out if args.command == "normalize" else None
+    failed = False
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(process_city, source, out, args.years) for source in args.sources]
+        for future in futures:
+            city, count, errors = future.result()
+            for error in errors:
+                print(error, file=sys.stderr)
+            print(f"{city} : {count} jours, {len(errors)} erreur(s)")
+            failed = failed or bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
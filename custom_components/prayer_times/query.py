@@ -0,0 +1,64 @@
+"""Requêtes groupées sur des plages de dates et plusieurs villes."""
+import calendar
+from array import array
+from datetime import timedelta
+
+from .timetable import NO_TIME, PRAYERS, PRAYER_INDEX, day_index, format_minutes
+
+_FEB_29 = 59
+
+
+def day_segments(start, end):
+    """Plages contiguës d'index (début, fin exclue) couvrant [start, end].
+
+    Le 29 février est sauté les années non bissextiles.
+    """
+    segments = []
+    for year in range(start.year, end.year + 1):
+        first = day_index(start) if year == start.year else 0
+        last = day_index(end) + 1 if year == end.year else 366
+        if not calendar.isleap(year) and first <= _FEB_29 < last:
+            segments.extend(((first, _FEB_29), (_FEB_29 + 1, last)))
+        else:
+            segments.append((first, last))
+    return [(first, last) for first, last in segments if first < last]
+
+
+def get_schedule(timetables, start, end, prayers=PRAYERS, iqama=False):
+    """Horaires de plusieurs villes sur [start, end], en colonnes.
+
+    Renvoie (dates, colonnes) où colonnes[ville][prière] est un array uint16
+    de minutes depuis minuit, NO_TIME pour une heure absente. Chaque colonne
+    est copiée par tranches du tableau annuel, sans passer par les jours.
+    """
+    segments = day_segments(start, end)
+    dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    columns = {}
+    for city, timetable in timetables.items():
+        source = timetable.iqama if iqama else timetable.minutes
+        city_columns = {}
+        for prayer in prayers:
+            column = array("H")
+            offset = PRAYER_INDEX[prayer]
+            for first, last in segments:
+                column.extend(source[first * len(PRAYERS) + offset:last * len(PRAYERS):len(PRAYERS)])
+            city_columns[prayer] = column
+        columns[city] = city_columns
+    return dates, columns
+
+
+def schedule_as_json(dates, columns, minutes=False):
+    """Mettre le résultat de get_schedule sous une forme sérialisable."""
+    if minutes:
+        def convert(column):
+            return [None if value == NO_TIME else value for value in column]
+    else:
+        def convert(column):
+            return [format_minutes(value) for value in column]
+    return {
+        "dates": [day.isoformat() for day in dates],
+        "cities": {
+            city: {prayer: convert(column) for prayer, column in city_columns.items()}
+            for city, city_columns in columns.items()
+        },
+    }
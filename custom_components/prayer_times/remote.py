@@ -0,0 +1,257 @@
+"""Horaires distants (serveur de type Mawaqit), écrits dans le répertoire de données.
+
+Chaque mosquée distante donne sa ville (le dossier écrit sous data/), le
+serveur, l'identifiant de la mosquée et, selon le serveur, un jeton d'API
+ou un nom d'utilisateur et un mot de passe :
+
+    prayer_times:
+      remote:
+        - city: oissel
+          server: https://mawaqit.net
+          uuid: 0a1b2c3d-...
+          api: !secret mawaqit_token
+
+Toutes les mosquées partagent la session HTTP de Home Assistant et sont
+téléchargées en parallèle, au plus MAX_PARALLEL à la fois. Les requêtes
+sont conditionnelles (ETag, Last-Modified) : un calendrier inchangé coûte
+une réponse 304 sans corps, et rien n'est réécrit. Les calendriers
+modifiés sont validés puis écrits en MM.csv comme par pipeline.py, et
+recompilés si leur ville est au manifeste de build.py ; les villes chargées
+sont ensuite relues comme après une modification locale.
+"""
+import asyncio
+import json
+import logging
+import os
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    API,
+    BINARY_FILE,
+    CONF_CITY,
+    CONF_DATA_DIR,
+    CONF_SERVER,
+    CONF_UUID,
+    DEFAULT_DATA_DIR,
+    PASSWORD,
+    REMOTE_INTERVAL,
+    USERNAME,
+)
+from .build import rebuild_cities
+from .pipeline import calendar_rows, check_day_counts, normalize, validate_rows, write_city
+from .shared import async_get_domain_data, async_reload_changed
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = "prayer_times.remote"
+STORAGE_VERSION = 1
+
+# Téléchargements simultanés, toutes mosquées confondues
+MAX_PARALLEL = 10
+REQUEST_TIMEOUT = 30
+
+
+class RemoteSource:
+    """Une mosquée distante et la ville où écrire ses horaires."""
+
+    __slots__ = ("city", "data_dir", "server", "uuid", "api", "user", "password")
+
+    def __init__(self, city, server, uuid, data_dir=DEFAULT_DATA_DIR, api=None, user=None, password=None):
+        self.city = city
+        self.data_dir = os.path.abspath(data_dir)
+        self.server = server.rstrip("/")
+        self.uuid = uuid
+        self.api = api
+        self.user = user
+        self.password = password
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config[CONF_CITY],
+            config[CONF_SERVER],
+            config[CONF_UUID],
+            config.get(CONF_DATA_DIR, DEFAULT_DATA_DIR),
+            config.get(API),
+            config.get(USERNAME),
+            config.get(PASSWORD),
+        )
+
+    @property
+    def key(self):
+        return f"{self.data_dir}:{self.city}"
+
+    @property
+    def path(self):
+        return os.path.join(self.data_dir, self.city)
+
+    @property
+    def url(self):
+        return f"{self.server}/api/2.0/mosque/{self.uuid}/prayer-times"
+
+
+async def async_fetch(session, semaphore, source, validators):
+    """Télécharger le calendrier d'une mosquée : (corps ou None si inchangé, validateurs)."""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    if source.api:
+        headers["Api-Access-Token"] = source.api
+    auth = aiohttp.BasicAuth(source.user, source.password or "") if source.user else None
+    async with semaphore:
+        async with session.get(
+            source.url, headers=headers, auth=auth, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        ) as response:
+            if response.status == 304:
+                return None, validators
+            response.raise_for_status()
+            body = await response.read()
+            return body, {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+async def async_fetch_all(session, sources, validators, parallel=MAX_PARALLEL):
+    """Télécharger toutes les mosquées en parallèle.
+
+    validators : {clé: validateurs} de la requête précédente. Renvoie
+    {clé: (corps ou None, validateurs)} ; une mosquée en erreur est
+    signalée et absente du résultat.
+    """
+    semaphore = asyncio.Semaphore(parallel)
+    results = await asyncio.gather(
+        *(async_fetch(session, semaphore, source, validators.get(source.key, {})) for source in sources),
+        return_exceptions=True,
+    )
+    fetched = {}
+    for source, result in zip(sources, results):
+        if isinstance(result, (aiohttp.ClientError, asyncio.TimeoutError)):
+            _LOGGER.warning("Téléchargement impossible pour la ville %s (%s) : %s", source.city, source.url, result)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            fetched[source.key] = result
+    return fetched
+
+
+def write_calendar(source, body):
+    """Valider un calendrier téléchargé et l'écrire en MM.csv (appel bloquant).
+
+    Renvoie les erreurs ; rien n'est écrit s'il y en a.
+    """
+    errors = []
+    try:
+        days = dict(validate_rows(source.url, calendar_rows(json.loads(body)), errors))
+    except (ValueError, AttributeError) as err:
+        return [f"{source.url} : calendrier invalide ({err})"]
+    check_day_counts(source.url, days, errors)
+    if errors:
+        return [str(error) for error in errors]
+    if not days:
+        return [f"{source.url} : calendrier vide"]
+    try:
+        write_city(source.path, normalize(days, None)[None])
+    except OSError as err:
+        return [f"{source.path} : écriture impossible ({err})"]
+    return []
+
+
+def write_calendars(changed, time_zone=None):
+    """Écrire les calendriers modifiés [(mosquée, corps)] (appel bloquant).
+
+    Les villes compilées au manifeste sont recompilées, sinon leurs nouveaux
+    CSV seraient ignorés au chargement. Renvoie les erreurs par mosquée.
+    """
+    errors = {source.key: write_calendar(source, body) for source, body in changed}
+    written = {}
+    for source, _ in changed:
+        if not errors[source.key]:
+            written.setdefault(source.data_dir, []).append(source.city)
+    for data_dir, cities in written.items():
+        try:
+            failures = rebuild_cities(data_dir, cities, time_zone)
+        except OSError as err:
+            _LOGGER.error("Manifeste non mis à jour dans %s : %s", data_dir, err)
+            continue
+        for city, city_errors in failures.items():
+            _LOGGER.warning("Ville %s non recompilée, lue depuis ses CSV : %s", city, "; ".join(city_errors))
+    return errors
+
+
+class RemoteUpdater:
+    """Rafraîchir les mosquées distantes et garder leurs validateurs dans .storage."""
+
+    def __init__(self, hass: HomeAssistant, sources):
+        self.hass = hass
+        self.sources = sources
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._validators = None
+
+    async def async_refresh(self, sources=None):
+        """Télécharger puis écrire les calendriers modifiés ; renvoie les villes écrites."""
+        sources = self.sources if sources is None else sources
+        if self._validators is None:
+            self._validators = (await self._store.async_load() or {}).get("validators", {})
+        fetched = await async_fetch_all(async_get_clientsession(self.hass), sources, self._validators)
+        changed = [(source, fetched[source.key][0]) for source in sources if fetched.get(source.key, (None,))[0]]
+        # Toutes les écritures en un seul passage dans l'exécuteur
+        errors = await self.hass.async_add_executor_job(write_calendars, changed, self.hass.config.time_zone)
+        written = []
+        for source in sources:
+            if source.key not in fetched:
+                continue
+            if errors.get(source.key):
+                # Validateurs inchangés : le calendrier sera retéléchargé
+                for error in errors[source.key]:
+                    _LOGGER.error("Calendrier distant ignoré, ville %s : %s", source.city, error)
+                continue
+            self._validators[source.key] = fetched[source.key][1]
+            if source.key in errors:
+                written.append(source.city)
+        if fetched:
+            self._store.async_delay_save(self._data_to_save, 10)
+        _LOGGER.debug("Mosquées distantes : %s téléchargées, %s modifiées", len(fetched), len(written))
+        return written
+
+    @callback
+    def _data_to_save(self):
+        return {"validators": self._validators}
+
+
+def missing_sources(sources):
+    """Mosquées dont la ville n'a pas encore d'horaires sur le disque."""
+    return [
+        source for source in sources
+        if not os.path.exists(os.path.join(source.path, "01.csv"))
+        and not os.path.exists(os.path.join(source.path, BINARY_FILE))
+    ]
+
+
+async def async_setup_remote(hass: HomeAssistant, configs, interval=REMOTE_INTERVAL):
+    """Rafraîchir les mosquées distantes maintenant puis à intervalle régulier.
+
+    Les villes pas encore présentes sur le disque sont attendues, pour que
+    leurs entités soient créées ; les autres sont rafraîchies en tâche de fond.
+    """
+    domain_data = async_get_domain_data(hass)
+    sources = [RemoteSource.from_config(config) for config in configs]
+    updater = domain_data["remote"] = RemoteUpdater(hass, sources)
+
+    missing = await hass.async_add_executor_job(missing_sources, sources)
+    if missing:
+        await updater.async_refresh(missing)
+
+    async def _async_refresh(now=None, sources=None):
+        if await updater.async_refresh(sources):
+            await async_reload_changed(hass)
+
+    present = [source for source in sources if source not in missing]
+    if present:
+        hass.async_create_task(_async_refresh(sources=present))
+    domain_data["unsub_remote"] = async_track_time_interval(hass, _async_refresh, interval)
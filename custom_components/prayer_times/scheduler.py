@@ -0,0 +1,86 @@
+"""Planification des mises à jour aux seules transitions réelles."""
+import heapq
+import logging
+from itertools import count
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PrayerScheduler:
+    """Tas global de réveils, un seul minuteur Home Assistant armé à la fois.
+
+    Chaque clé (une ville) n'a qu'un réveil en attente : replanifier une clé
+    invalide l'entrée précédente, qui est ignorée lorsqu'elle sort du tas.
+    Les instants sont des secondes UTC depuis l'epoch : le tas ne compare que
+    des entiers, convertis en datetime seulement pour armer le minuteur.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self._heap = []
+        self._pending = {}
+        self._sequence = count()
+        self._unsub = None
+        self._armed_at = None
+
+    @callback
+    def async_schedule(self, key, when, action):
+        """Appeler action(now) à l'instant when (secondes UTC) pour cette clé."""
+        sequence = next(self._sequence)
+        self._pending[key] = sequence
+        heapq.heappush(self._heap, (when, sequence, key, action))
+        if self._armed_at is None or when < self._armed_at:
+            self._async_arm()
+
+    @callback
+    def async_cancel(self, key):
+        """Oublier le réveil en attente pour cette clé."""
+        self._pending.pop(key, None)
+
+    @callback
+    def async_stop(self):
+        """Désarmer le minuteur et vider le tas."""
+        if self._unsub is not None:
+            self._unsub()
+        self._unsub = None
+        self._armed_at = None
+        self._heap.clear()
+        self._pending.clear()
+
+    @callback
+    def _async_arm(self):
+        while self._heap and self._pending.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+            self._armed_at = None
+        if not self._heap:
+            return
+        self._armed_at = self._heap[0][0]
+        self._unsub = async_track_point_in_utc_time(
+            self.hass, self._async_fire, dt_util.utc_from_timestamp(self._armed_at)
+        )
+
+    @callback
+    def _async_fire(self, now):
+        self._unsub = None
+        self._armed_at = None
+        due = []
+        timestamp = now.timestamp()
+        while self._heap and self._heap[0][0] <= timestamp:
+            _, sequence, key, action = heapq.heappop(self._heap)
+            if self._pending.get(key) == sequence:
+                del self._pending[key]
+                due.append(action)
+        for action in due:
+            try:
+                action(now)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Erreur lors d'une mise à jour planifiée")
+        if self._armed_at is None:
+            self._async_arm()
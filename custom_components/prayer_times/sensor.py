@@ -1,200 +1,314 @@
-import csv
 import logging
-import os
-from datetime import datetime, timedelta
+import sys
+from datetime import timedelta
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import discovery  
-from homeassistant.helpers.event import async_track_time_interval  # Importation nécessaire
-from homeassistant.helpers.entity import Entity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import CONF_IDLE_TIMEOUT, CONF_LAZY_LOAD, DEFAULT_DATA_DIR, NEXT_SALAT_PREPARATION, SIGNAL_CITIES_ADDED
+from .announcements import announce_leads
+from .coordinator import PrayerTimesCoordinator
+from .shared import async_get_cache, async_get_domain_data, async_get_snapshot, async_migrate_unique_ids
+from .stats import Timer
+from .timetable import DATED_PRAYERS, FRIDAY_SLOTS, IQAMA_PRAYERS, format_minutes
 
 # Définition du domaine
 DOMAIN = "prayer_times"
-BASE_DATA_PATH = os.path.join(os.path.dirname(__file__), "/config/custom_components/prayer_times/data/")
+BASE_DATA_PATH = DEFAULT_DATA_DIR
 _LOGGER = logging.getLogger(__name__)
 
-def read_daily_prayer_times(city, month):
-    filename = os.path.join(BASE_DATA_PATH, city, f"{month:02}.csv")
-    _LOGGER.debug("Lecture des horaires de prière depuis : %s", filename)
-    prayer_times = {}
-    try:
-        with open(filename, 'r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                date = row['date']
-                prayer_times[date] = {
-                    'Fajr': row['Fajr'],
-                    'Shurouq': row['Shurouq'],
-                    'Dhuhr': row['Dhuhr'],
-                    'Asr': row['Asr'],
-                    'Maghrib': row['Maghrib'],
-                    'Isha': row['Isha']
-                }
-    except FileNotFoundError:
-        _LOGGER.error("Fichier non trouvé : %s", filename)
-    return prayer_times
-
-def read_iqama_times(city):
-    filename = os.path.join(BASE_DATA_PATH, city, "iqama.csv")
-    _LOGGER.debug("Lecture des temps d'iqama depuis : %s", filename)
-    try:
-        with open(filename, 'r') as file:
-            reader = csv.DictReader(file)
-            return next(reader)
-    except FileNotFoundError:
-        _LOGGER.error("Fichier non trouvé : %s", filename)
-        return {}
-
-def read_friday_prayer_time(city):
-    filename = os.path.join(BASE_DATA_PATH, city, "vendredi.csv")
-    _LOGGER.debug("Lecture de la prière du vendredi depuis : %s", filename)
-    try:
-        with open(filename, 'r') as file:
-            return file.readline().strip()
-    except FileNotFoundError:
-        _LOGGER.error("Fichier non trouvé : %s", filename)
-        return None
-
-class PrayerTimeSensor(Entity):
-    def __init__(self, city, prayer, time):
-        self.city = city
-        self.prayer = prayer
-        self.time = time
-        self._state = None
+class PrayerTimesEntity(CoordinatorEntity):
+    """Entité d'une ville qui n'écrit son état que s'il a changé.
+
+    Le coordinateur notifie toutes les entités de la ville dans un même appel
+    à chaque transition : seules celles dont la valeur change écrivent leur
+    état, ce qui évite autant de lignes dans l'historique. Chaque écriture
+    est mesurée (voir stats.py).
+
+    Le nom est calculé une fois : les heures restent des minutes entières
+    dans l'horaire du coordinateur, partagé par toutes les entités de la
+    ville.
+    """
+
+    def __init__(self, coordinator, key):
+        super().__init__(coordinator)
+        self.city = coordinator.city
+        self._entity_name = sys.intern(f"{coordinator.city}_{key}")
+        self._unique_id = f"{coordinator.unique_key}_{key}"
+        self._written_state = None
 
     @property
     def name(self):
-        return f"{self.city}_{self.prayer}"
+        return self._entity_name
+
+    @property
+    def unique_id(self):
+        """Identifiant unique : l'entité peut être désactivée dans le registre."""
+        return self._unique_id
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        # État écrit par Home Assistant à l'ajout de l'entité
+        self._written_state = (self.state, self.available)
+
+    @callback
+    def _handle_coordinator_update(self):
+        stats = self.coordinator.stats
+        state = (self.state, self.available)
+        if state == self._written_state:
+            stats.noop_updates += 1
+            return
+        self._written_state = state
+        with Timer(stats.write):
+            self.async_write_ha_state()
+        stats.writes += 1
+
+class PrayerTimeSensor(PrayerTimesEntity):
+    def __init__(self, coordinator, prayer):
+        super().__init__(coordinator, prayer)
+        self.prayer = prayer
 
     @property
     def state(self):
-        return self._state
+        if self.coordinator.data is None:
+            return None
+        return format_minutes(self.coordinator.data.adhan.get(self.prayer))
 
-    def update(self):
-        today = datetime.now().strftime('%m-%d')
-        self._state = self.time.get(today, {}).get(self.prayer)
-    
     @property
     def icon(self):
         """Icon to display in the front end."""
         return "mdi:mosque-outline"
 
-class IqamaTimeSensor(Entity):
-    def __init__(self, city, prayer, base_time, iqama_delay):
-        self.city = city
+class IqamaTimeSensor(PrayerTimesEntity):
+    def __init__(self, coordinator, prayer):
+        super().__init__(coordinator, f"iqama_{prayer}")
         self.prayer = prayer
-        self.base_time = base_time
-        self.iqama_delay = iqama_delay
-        self._state = None
 
     @property
-    def name(self):
-        return f"{self.city}_iqama_{self.prayer}"
+    def state(self):
+        if self.coordinator.data is None:
+            return None
+        return format_minutes(self.coordinator.data.iqama.get(self.prayer))
+
+    @property
+    def icon(self):
+        """Icon to display in the front end."""
+        return "mdi:calendar-clock"
+
+class FridayPrayerSensor(PrayerTimesEntity):
+    """Un créneau de la prière du vendredi, celui de ce vendredi ou du prochain."""
+
+    def __init__(self, coordinator, slot="Jumua"):
+        suffix = "" if slot == FRIDAY_SLOTS[0] else f"_{FRIDAY_SLOTS.index(slot) + 1}"
+        super().__init__(coordinator, f"friday_prayer{suffix}")
+        self.slot = slot
+
+    @property
+    def state(self):
+        if self.coordinator.data is None:
+            return None
+        return format_minutes(self.coordinator.data.friday.get(self.slot))
+
+    @property
+    def icon(self):
+        """Icon to display in the front end."""
+        return "mdi:mosque"
+
+class DatedPrayerSensor(PrayerTimesEntity):
+    """Prière datée (Aïd, tarawih) : son heure les jours où elle a lieu."""
+
+    def __init__(self, coordinator, prayer):
+        super().__init__(coordinator, prayer.lower())
+        self.prayer = prayer
 
     @property
     def state(self):
-        return self._state
+        if self.coordinator.data is None:
+            return None
+        return format_minutes(self.coordinator.data.special.get(self.prayer))
+
+    @property
+    def icon(self):
+        """Icon to display in the front end."""
+        return "mdi:star-crescent"
+
+class NextSalatSensor(PrayerTimesEntity):
+    """Prochaine prière : heure, nom ou heure de préparation."""
+
+    def __init__(self, coordinator, sensor_type):
+        super().__init__(coordinator, sensor_type)
+        self.sensor_type = sensor_type
+
+    @property
+    def state(self):
+        schedule = self.coordinator.data
+        if schedule is None or schedule.next_salat is None:
+            return None
+        if self.sensor_type == "Next Salat Name":
+            return schedule.next_salat
+        if self.sensor_type == "Next Salat Preparation":
+            return format_minutes(schedule.next_salat_time - NEXT_SALAT_PREPARATION)
+        return format_minutes(schedule.next_salat_time)
 
-    def update(self):
-        today = datetime.now().strftime('%m-%d')
-        prayer_time = self.base_time.get(today, {}).get(self.prayer)
-        if prayer_time:
-            prayer_time_dt = datetime.strptime(prayer_time, '%H:%M')
-            iqama_time = prayer_time_dt + timedelta(minutes=int(self.iqama_delay[self.prayer]))
-            self._state = iqama_time.strftime('%H:%M')
-    
     @property
     def icon(self):
         """Icon to display in the front end."""
         return "mdi:calendar-clock"
 
-class FridayPrayerSensor(Entity):
-    def __init__(self, city):
-        self.city = city
-        self._state = None
-        self.friday_time = None
+class DebugSensor(CoordinatorEntity):
+    """Coût des mises à jour de la ville ; désactivé par défaut."""
+
+    _attr_entity_registry_enabled_default = False
+    # Les histogrammes ne sont pas enregistrés dans l'historique
+    _unrecorded_attributes = frozenset({"load", "compute", "write"})
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+        self.city = coordinator.city
+        self._entity_name = sys.intern(f"{coordinator.city}_debug")
+        self._unique_id = f"{coordinator.unique_key}_debug"
 
     @property
     def name(self):
-        return f"{self.city}_friday_prayer"
+        return self._entity_name
 
     @property
     def unique_id(self):
         """Identifiant unique pour cette entité."""
-        return f"{self.city}_friday_prayer"
+        return self._unique_id
 
     @property
     def state(self):
-        return self._state
+        return self.coordinator.stats.writes
 
-    def update(self):
-        self.friday_time = read_friday_prayer_time(self.city)
-        self._state = self.friday_time
+    @property
+    def extra_state_attributes(self):
+        cache = self.coordinator.cache
+        return {
+            **self.coordinator.stats.as_dict(),
+            "city_cache_hits": cache.hits,
+            "city_cache_misses": cache.misses,
+            "file_cache_hits": cache.files.hits,
+            "file_cache_misses": cache.files.misses,
+        }
 
     @property
     def icon(self):
         """Icon to display in the front end."""
-        return "mdi:mosque"
+        return "mdi:bug-outline"
 
-async def update_sensors(sensors):
-    """Met à jour tous les capteurs."""
-    for sensor in sensors:
-        if hasattr(sensor, "update"):
-            sensor.update()
-
-async def async_setup(hass: HomeAssistant, config: dict):
-    """Configurer le domaine au chargement."""
-    _LOGGER.debug("Initialisation de l'intégration Prayer Times.")
-    
-    # Charge la plateforme de capteurs de manière asynchrone
-    await discovery.async_load_platform(hass, "sensor", DOMAIN, {}, config)
-    
-    # Initialiser les capteurs
-    sensors = hass.data.get(DOMAIN, {}).get("sensors", [])
-    
-    # Mise à jour des capteurs toutes les 10 secondes
-    async_track_time_interval(
-        hass, 
-        lambda _: update_sensors(sensors), 
-        timedelta(seconds=10)
-    )
-    
-    return True
-
-def setup_platform(hass, config, add_entities, discovery_info=None):
-    _LOGGER.debug("Configuration de la plateforme de capteurs pour Prayer Times.")
-    cities = [name for name in os.listdir(BASE_DATA_PATH) if os.path.isdir(os.path.join(BASE_DATA_PATH, name))]
-    month = datetime.now().month
+def city_sensors(coordinator, special):
+    """Les entités d'une ville, toutes abonnées à son coordinateur.
 
+    special : horaires particuliers de la ville (voir Timetable.special_names).
+    """
     sensors = []
+    for prayer in IQAMA_PRAYERS:
+        sensors.append(PrayerTimeSensor(coordinator, prayer))
+        sensors.append(IqamaTimeSensor(coordinator, prayer))
 
-    for city in cities:
-        prayer_times = read_daily_prayer_times(city, month)
-        iqama_times = read_iqama_times(city)
-        friday_time = read_friday_prayer_time(city)
+    for slot in FRIDAY_SLOTS:
+        if slot in special:
+            sensors.append(FridayPrayerSensor(coordinator, slot))
+    for prayer in DATED_PRAYERS:
+        if prayer in special:
+            sensors.append(DatedPrayerSensor(coordinator, prayer))
 
-        if not prayer_times or not iqama_times:
-            _LOGGER.error("Les données de prière ou d'iqama sont manquantes pour la ville : %s", city)
-            continue
+    for sensor_type in ("Next Salat Time", "Next Salat Name", "Next Salat Preparation"):
+        sensors.append(NextSalatSensor(coordinator, sensor_type))
+
+    sensors.append(DebugSensor(coordinator))
+    return sensors
+
+async def async_setup_platform(hass: HomeAssistant, config, async_add_entities, discovery_info=None):
+    _LOGGER.debug("Configuration de la plateforme de capteurs pour Prayer Times.")
+    domain_data = async_get_domain_data(hass)
+    cache = async_get_cache(hass, BASE_DATA_PATH)
+    scheduler = domain_data["scheduler"]
+    coordinators = domain_data["coordinators"]
 
-        for prayer in ['Fajr', 'Dhuhr', 'Asr', 'Maghrib', 'Isha']:
-            prayer_sensor = PrayerTimeSensor(city, prayer, prayer_times)
-            iqama_sensor = IqamaTimeSensor(city, prayer, prayer_times, iqama_times)
-            sensors.append(prayer_sensor)
-            sensors.append(iqama_sensor)
+    options = discovery_info or {}
+    if CONF_IDLE_TIMEOUT in options:
+        domain_data["idle_timeout"] = timedelta(seconds=options[CONF_IDLE_TIMEOUT])
 
-        if friday_time:
-            sensors.append(FridayPrayerSensor(city))
+    snapshot = await async_get_snapshot(hass)
+    prefix = f"{cache.base_path}:"
+    restored = [key[len(prefix):] for key in snapshot.keys(prefix)]
 
-    if sensors:
-        add_entities(sensors)
-        hass.data.setdefault(DOMAIN, {})["sensors"] = sensors  # Stocker les capteurs
-        _LOGGER.debug("Capteurs ajoutés : %s", [sensor.name for sensor in sensors])
+    # Toutes les lectures de fichiers se font dans l'exécuteur, en un seul lot
+    if options.get(CONF_LAZY_LOAD):
+        # Seul l'index est lu : chaque ville sera chargée par ses entités
+        index = await hass.async_add_executor_job(cache.index)
+        cities = dict.fromkeys(index)
+    elif restored:
+        # Les villes de l'instantané sont restaurées tout de suite, les
+        # fichiers sont relus ensuite en tâche de fond
+        cities = dict.fromkeys(restored)
+        index = {}
     else:
+        cities = await hass.async_add_executor_job(cache.load_all)
+        index = {city: data.timetable.special_names() for city, data in cities.items()}
+
+    sensors = []
+    # Coordinateurs créés ici, annoncés au calendrier
+    created = []
+
+    def add_city(city, data):
+        if data is not None and (not data.timetable or not data.timetable.has_iqama()):
+            _LOGGER.error("Les données de prière ou d'iqama sont manquantes pour la ville : %s", city)
+            return []
+
+        # Un seul calcul par ville, partagé par toutes ses entités
+        coordinator = PrayerTimesCoordinator(
+            hass, scheduler, cache, city, data, snapshot, domain_data["stats"], announce_leads(options)
+        )
+        if data is not None:
+            coordinator.async_refresh_schedule()
+        elif city not in index:
+            if not coordinator.async_restore():
+                return []
+            index[city] = coordinator.city_data.timetable.special_names()
+        coordinators[city] = coordinator
+        created.append(coordinator)
+        return city_sensors(coordinator, index[city])
+
+    for city, data in cities.items():
+        sensors.extend(add_city(city, data))
+
+    if not options.get(CONF_LAZY_LOAD) and restored:
+        async def _async_verify_restored():
+            """Comparer l'instantané aux fichiers, et ajouter les nouvelles villes."""
+            loaded = await hass.async_add_executor_job(cache.load_all)
+            added = []
+            count = len(created)
+            for city, data in loaded.items():
+                coordinator = coordinators.get(city)
+                if coordinator is None:
+                    added.extend(add_city(city, data))
+                else:
+                    await coordinator.async_verify(data)
+            for city in restored:
+                if city not in loaded:
+                    snapshot.async_remove(f"{prefix}{city}")
+            if added:
+                async_add_entities(async_migrate_unique_ids(hass, "sensor", added))
+                sensors.extend(added)
+                async_dispatcher_send(hass, SIGNAL_CITIES_ADDED, created[count:])
+
+        hass.async_create_task(_async_verify_restored())
+
+    if not sensors:
         _LOGGER.warning("Aucun capteur créé.")
+        return
+
+    async_add_entities(async_migrate_unique_ids(hass, "sensor", sensors))
+    domain_data["sensors"] = sensors  # Stocker les capteurs
+    async_dispatcher_send(hass, SIGNAL_CITIES_ADDED, created)
+    _LOGGER.debug("Capteurs ajoutés : %s", [sensor.name for sensor in sensors])
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
-    """Configurer la plateforme via Config Flow si utilisé dans le futur."""
-    await hass.config_entries.async_setup_platforms(entry, ["sensor"])
-    return True
-    
\ No newline at end of file
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
+    """Entités de la mosquée d'une entrée de configuration."""
+    coordinator = async_get_domain_data(hass)["coordinators"][entry.entry_id]
+    sensors = city_sensors(coordinator, coordinator.city_data.timetable.special_names())
+    async_add_entities(async_migrate_unique_ids(hass, "sensor", sensors))
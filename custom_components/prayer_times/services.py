@@ -0,0 +1,74 @@
+"""Services de l'intégration Prayer Times."""
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .const import DOMAIN
+from .query import get_schedule, schedule_as_json
+from .timetable import PRAYERS
+
+SERVICE_GET_SCHEDULE = "get_schedule"
+
+GET_SCHEDULE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("cities"): vol.All(cv.ensure_list, [cv.string]),
+        vol.Required("start_date"): cv.date,
+        vol.Optional("end_date"): cv.date,
+        vol.Optional("prayers", default=list(PRAYERS)): vol.All(cv.ensure_list, [vol.In(PRAYERS)]),
+        vol.Optional("iqama", default=False): cv.boolean,
+        vol.Optional("minutes", default=False): cv.boolean,
+    }
+)
+
+
+async def async_get_timetables(hass: HomeAssistant, cities=None):
+    """Horaires des villes demandées, chargées dans l'exécuteur si besoin.
+
+    Une ville présente dans plusieurs répertoires de données est prise dans
+    le premier configuré.
+    """
+    caches = list(hass.data.get(DOMAIN, {}).get("caches", {}).values())
+    if not caches:
+        raise ServiceValidationError("Aucune donnée de prière chargée")
+    known = {}
+    for cache in caches:
+        for city in await hass.async_add_executor_job(cache.list):
+            known.setdefault(city, cache)
+    for city in cities or ():
+        if city not in known:
+            raise ServiceValidationError(f"Ville inconnue : {city}")
+    # Un seul passage dans l'exécuteur par répertoire ; les villes lues pour
+    # la requête ne restent pas en mémoire
+    requested = {}
+    for city in cities or known:
+        requested.setdefault(known[city], []).append(city)
+    found = {}
+    for cache, names in requested.items():
+        loaded = {city: cache.get(city) for city in names}
+        missing = [city for city, data in loaded.items() if data is None]
+        if missing:
+            loaded.update(await hass.async_add_executor_job(cache.read_many, missing))
+        found.update(loaded)
+    return {city: found[city].timetable for city in cities or known}
+
+def async_setup_services(hass: HomeAssistant):
+    """Enregistrer les services du domaine."""
+
+    async def _async_get_schedule(call: ServiceCall):
+        start = call.data["start_date"]
+        end = call.data.get("end_date", start)
+        if end < start:
+            raise ServiceValidationError("end_date doit suivre start_date")
+        timetables = await async_get_timetables(hass, call.data.get("cities"))
+        dates, columns = get_schedule(timetables, start, end, call.data["prayers"], call.data["iqama"])
+        return schedule_as_json(dates, columns, call.data["minutes"])
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_SCHEDULE,
+        _async_get_schedule,
+        schema=GET_SCHEDULE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
@@ -0,0 +1,141 @@
+"""Données partagées par toutes les mosquées dans hass.data[DOMAIN]."""
+import hashlib
+import os
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_track_time_change, async_track_time_interval
+
+from .const import CACHE_FILE, DEFAULT_DATA_DIR, DEFAULT_IDLE_TIMEOUT, DOMAIN, RELOAD_INTERVAL, UPDATE_TIME
+from .daily import async_daily_update
+from .loader import CityCache, TimetableStore
+from .scheduler import PrayerScheduler
+from .snapshot import TimetableSnapshot
+from .stats import PrayerStats
+
+
+@callback
+def async_get_domain_data(hass: HomeAssistant):
+    """Magasin commun : un CityCache par répertoire, un planificateur, les coordinateurs.
+
+    Les coordinateurs sont indexés par ville pour la configuration YAML et par
+    identifiant d'entrée pour les entrées de configuration.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "scheduler" not in domain_data:
+        domain_data.update(
+            scheduler=PrayerScheduler(hass),
+            store=TimetableStore(),
+            snapshot=TimetableSnapshot(hass),
+            stats=PrayerStats(),
+            caches={},
+            coordinators={},
+            idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        )
+
+        @callback
+        def _async_stop(event: Event):
+            """Arrêt de Home Assistant : plus aucun réveil ni minuteur de l'intégration."""
+            domain_data["scheduler"].async_stop()
+            for key in [key for key in domain_data if key.startswith("unsub_")]:
+                domain_data.pop(key)()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
+    return domain_data
+
+
+@callback
+def async_migrate_unique_ids(hass: HomeAssistant, platform, entities):
+    """Reporter dans le registre les anciens unique_id, égaux au nom de l'entité.
+
+    La première source d'une ville garde ainsi ses entités (identifiant,
+    désactivation) ; les suivantes en créent de nouvelles.
+    """
+    registry = er.async_get(hass)
+    for entity in entities:
+        if registry.async_get_entity_id(platform, DOMAIN, entity.unique_id):
+            continue
+        entity_id = registry.async_get_entity_id(platform, DOMAIN, entity.name)
+        if entity_id is not None:
+            registry.async_update_entity(entity_id, new_unique_id=entity.unique_id)
+    return entities
+
+
+async def async_get_snapshot(hass: HomeAssistant):
+    """L'instantané des horaires, lu depuis .storage au premier appel."""
+    domain_data = async_get_domain_data(hass)
+    if "snapshot_loaded" not in domain_data:
+        # Une seule lecture, même si plusieurs entrées démarrent en même temps
+        domain_data["snapshot_loaded"] = hass.async_create_task(domain_data["snapshot"].async_load())
+    await domain_data["snapshot_loaded"]
+    return domain_data["snapshot"]
+
+
+def cache_file(hass: HomeAssistant, data_dir):
+    """Fichier de cache d'un répertoire de données, dans .storage."""
+    if os.path.abspath(data_dir) == os.path.abspath(DEFAULT_DATA_DIR):
+        return hass.config.path(".storage", CACHE_FILE)
+    suffix = hashlib.sha1(os.path.abspath(data_dir).encode()).hexdigest()[:8]
+    return hass.config.path(".storage", f"{CACHE_FILE}.{suffix}")
+
+
+@callback
+def async_get_cache(hass: HomeAssistant, data_dir):
+    """Le CityCache du répertoire, créé au premier appel."""
+    domain_data = async_get_domain_data(hass)
+    caches = domain_data["caches"]
+    data_dir = os.path.abspath(data_dir)
+    if data_dir not in caches:
+        caches[data_dir] = CityCache(
+            data_dir,
+            cache_file(hass, data_dir),
+            time_zone=hass.config.time_zone,
+            store=domain_data["store"],
+            stats=domain_data["stats"],
+        )
+        _async_start_reload(hass, domain_data)
+        _async_start_daily(hass, domain_data)
+    return caches[data_dir]
+
+
+async def async_reload_changed(hass: HomeAssistant):
+    """Prendre en compte les fichiers modifiés sans redémarrer."""
+    domain_data = async_get_domain_data(hass)
+    for cache in list(domain_data["caches"].values()):
+        changed = await hass.async_add_executor_job(cache.reload_changed)
+        for coordinator in domain_data["coordinators"].values():
+            data = changed.get(coordinator.city)
+            if coordinator.cache is not cache or data is None or coordinator.city_data is None:
+                continue
+            if not data.timetable or not data.timetable.has_iqama():
+                continue
+            coordinator.async_set_city_data(data)
+
+
+@callback
+def _async_start_reload(hass: HomeAssistant, domain_data):
+    """Un seul minuteur pour tous les répertoires : fichiers modifiés et éviction."""
+    if "unsub_reload" in domain_data:
+        return
+
+    async def _async_reload(now):
+        await async_reload_changed(hass)
+        # Villes chargées par une requête puis plus utilisées
+        for cache in list(domain_data["caches"].values()):
+            cache.evict_idle(domain_data["idle_timeout"].total_seconds())
+
+    domain_data["unsub_reload"] = async_track_time_interval(hass, _async_reload, RELOAD_INTERVAL)
+
+
+@callback
+def _async_start_daily(hass: HomeAssistant, domain_data):
+    """Une seule tâche quotidienne pour toutes les villes, à UPDATE_TIME."""
+    if "unsub_daily" in domain_data:
+        return
+
+    async def _async_daily(now):
+        await async_daily_update(hass, domain_data, now)
+
+    hour, minute, second = UPDATE_TIME
+    domain_data["unsub_daily"] = async_track_time_change(hass, _async_daily, hour=hour, minute=minute, second=second)
@@ -0,0 +1,125 @@
+"""Instantané des horaires compilés, conservé entre deux redémarrages.
+
+Pour chaque ville sont enregistrés les tableaux annuels (adhan, iqama et
+horaires particuliers), le fuseau horaire et l'horaire calculé du jour, avec
+une version : une empreinte du contenu. Au démarrage les entités repartent de l'instantané,
+puis les fichiers sources sont relus en tâche de fond et l'instantané n'est
+remplacé que si la version a changé.
+"""
+import base64
+import hashlib
+import sys
+from array import array
+from datetime import date
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .loader import CityData
+from .timetable import Timetable
+
+STORAGE_KEY = "prayer_times.snapshot"
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def data_version(data):
+    """Empreinte du contenu compilé d'une ville."""
+    digest = hashlib.sha1(data.timetable.minutes)
+    digest.update(data.timetable.iqama)
+    digest.update(data.timetable.special)
+    digest.update(str(data.timetable.special_year).encode())
+    digest.update((data.time_zone or "").encode())
+    return digest.hexdigest()
+
+
+def _encode(values):
+    values = array("H", values)
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode(text):
+    values = array("H", base64.b64decode(text))
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+class TimetableSnapshot:
+    """Instantanés de toutes les villes, dans un seul fichier de .storage."""
+
+    def __init__(self, hass: HomeAssistant):
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._cities = {}
+
+    async def async_load(self):
+        stored = await self._store.async_load()
+        self._cities = (stored or {}).get("cities", {})
+
+    def keys(self, prefix):
+        """Clés des villes enregistrées d'un répertoire."""
+        return [key for key in self._cities if key.startswith(prefix)]
+
+    def restore(self, key, city):
+        """(données, version, horaire du jour enregistré) ou None."""
+        entry = self._cities.get(key)
+        if entry is None:
+            return None
+        try:
+            timetable = Timetable(
+                city, _decode(entry["minutes"]), _decode(entry["iqama"]), _decode(entry["special"])
+            )
+            timetable.year = entry.get("year")
+            timetable.special_year = entry.get("special_year")
+            today = entry.get("today")
+            if today is not None:
+                today = (
+                    date.fromisoformat(today["day"]),
+                    today["adhan"],
+                    today["iqama"],
+                    today["friday"],
+                    today["special"],
+                )
+            data = CityData(city, timetable, None, entry.get("time_zone"))
+            return data, entry["version"], today
+        except (KeyError, TypeError, ValueError):
+            # Instantané illisible : la ville sera relue depuis ses fichiers
+            return None
+
+    @callback
+    def async_update(self, key, data, version, schedule=None):
+        """Enregistrer une ville (écriture différée et regroupée)."""
+        entry = self._cities.get(key)
+        if entry is None or entry["version"] != version:
+            entry = {
+                "version": version,
+                "minutes": _encode(data.timetable.minutes),
+                "iqama": _encode(data.timetable.iqama),
+                "special": _encode(data.timetable.special),
+                "special_year": data.timetable.special_year,
+                "time_zone": data.time_zone,
+                "year": data.timetable.year,
+            }
+            self._cities[key] = entry
+        if schedule is not None:
+            entry["today"] = {
+                "day": schedule.day.isoformat(),
+                "adhan": schedule.adhan,
+                "iqama": schedule.iqama,
+                "friday": schedule.friday,
+                "special": schedule.special,
+            }
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_remove(self, key):
+        if self._cities.pop(key, None) is not None:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self):
+        return {"cities": self._cities}
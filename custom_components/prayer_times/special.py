@@ -0,0 +1,219 @@
+"""Règles des horaires du vendredi et des jours particuliers.
+
+vendredi.csv donne les créneaux de la prière du vendredi. L'ancien format,
+une seule heure sur la première ligne ("13:00"), reste accepté. Sinon :
+
+    slot,time,start,end,season
+    1,13:00
+    2,14:15
+    1,12:30,11-01,02-28
+    1,Dhuhr+30,,,summer
+
+- slot : 1 (Jumua) ou 2 (Jumua 2) ;
+- time : heure fixe "HH:MM" ou décalage en minutes après une prière du jour
+  ("Dhuhr+30"), qui suit donc les saisons et le changement d'heure ;
+- start, end : période "MM-JJ" facultative, qui peut passer le nouvel an ;
+- season : summer ou winter, limite la ligne aux jours à l'heure d'été ou
+  d'hiver dans le fuseau de la mosquée.
+
+evenements.csv donne les prières datées, qui changent chaque année :
+
+    name,time,start,end
+    Eid,08:30,2026-03-20
+    Taraweeh,Isha+15,2026-02-18,2026-03-19
+
+Comme pour iqama.csv, les lignes suivantes remplacent les précédentes sur
+leur période. Les règles sont compilées une fois par chargement dans le
+tableau annuel Timetable.special : aucune règle n'est évaluée ensuite.
+"""
+import csv
+import io
+import logging
+from array import array
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .events import MINUTES_PER_DAY
+from .timetable import (
+    DATED_PRAYERS,
+    DAYS_PER_YEAR,
+    FRIDAY_SLOTS,
+    NO_TIME,
+    PRAYER_INDEX,
+    PRAYERS,
+    SPECIAL,
+    SPECIAL_INDEX,
+    RuleError,
+    day_index,
+    parse_clock,
+    parse_day,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SEASONS = ("summer", "winter")
+
+# Année bissextile de référence, pour retrouver la date d'un index de jour
+_REFERENCE_YEAR = 2000
+
+
+def parse_value(text):
+    """Heure fixe "HH:MM" ou "Prière+minutes" : (index de prière ou None, minutes).
+
+    L'heure fixe va de 00:00 à 23:59 et le décalage reste dans la journée ;
+    ValueError sinon.
+    """
+    text = text.strip()
+    if ":" in text:
+        return None, parse_clock(text)
+    prayer, sign, offset = text.partition("+")
+    if not sign:
+        prayer, sign, offset = text.partition("-")
+    prayer = prayer.strip()
+    if prayer not in PRAYER_INDEX:
+        raise ValueError(f"heure invalide : {text!r}")
+    if sign and not offset.strip().isdigit():
+        raise ValueError(f"décalage invalide : {text!r}")
+    minutes = int(offset) if sign else 0
+    if minutes >= MINUTES_PER_DAY:
+        raise ValueError(f"décalage hors de la journée : {text!r}")
+    return PRAYER_INDEX[prayer], -minutes if sign == "-" else minutes
+
+
+def _parse_friday_row(row):
+    """Règle d'une ligne de vendredi.csv ; ValueError si elle est invalide."""
+    slot = (row.get("slot") or "").strip() or "1"
+    if not slot.isdigit() or not 1 <= int(slot) <= len(FRIDAY_SLOTS):
+        raise ValueError(f"créneau invalide : {slot!r}")
+    season = (row.get("season") or "").strip() or None
+    if season is not None and season not in SEASONS:
+        raise ValueError(f"saison invalide : {season!r}")
+    start, end = (row.get("start") or "").strip(), (row.get("end") or "").strip()
+    try:
+        first_day, last_day = (parse_day(start), parse_day(end or start)) if start else (0, DAYS_PER_YEAR - 1)
+    except (ValueError, IndexError):
+        raise ValueError(f"période invalide : {start!r} à {end!r}") from None
+    return SPECIAL_INDEX[FRIDAY_SLOTS[int(slot) - 1]], first_day, last_day, season, parse_value(row.get("time") or "")
+
+
+def parse_friday(text):
+    """Analyser vendredi.csv en règles (index, premier jour, dernier jour, saison, valeur).
+
+    Une valeur invalide lève RuleError avec le numéro de sa ligne.
+    """
+    first = text.partition("\n")[0].strip()
+    if not first:
+        return ()
+    if "," not in first:
+        # Ancien format : une seule heure, pour tous les vendredis
+        try:
+            return ((SPECIAL_INDEX["Jumua"], 0, DAYS_PER_YEAR - 1, None, parse_value(first)),)
+        except ValueError as err:
+            raise RuleError(1, str(err)) from None
+    rules = []
+    reader = csv.DictReader(io.StringIO(text))
+    for row in reader:
+        try:
+            rules.append(_parse_friday_row(row))
+        except ValueError as err:
+            raise RuleError(reader.line_num, str(err)) from None
+    return tuple(rules)
+
+
+def _parse_event_row(row):
+    """Règle d'une ligne de evenements.csv ; ValueError si elle est invalide."""
+    name = (row.get("name") or "").strip()
+    if name not in DATED_PRAYERS:
+        raise ValueError(f"prière inconnue : {name!r}")
+    start, end = (row.get("start") or "").strip(), (row.get("end") or "").strip()
+    try:
+        first = date.fromisoformat(start)
+        last = date.fromisoformat(end) if end else first
+    except ValueError:
+        raise ValueError(f"période invalide : {start!r} à {end!r}") from None
+    return SPECIAL_INDEX[name], first.toordinal(), last.toordinal(), parse_value(row.get("time") or "")
+
+
+def parse_events(text):
+    """Analyser evenements.csv en règles (index, premier jour, dernier jour, valeur).
+
+    Les dates sont des ordinaux (date.toordinal) : les règles restent des
+    types simples, enregistrables dans le cache des fichiers. Une valeur
+    invalide lève RuleError avec le numéro de sa ligne.
+    """
+    rules = []
+    reader = csv.DictReader(io.StringIO(text))
+    for row in reader:
+        try:
+            rules.append(_parse_event_row(row))
+        except ValueError as err:
+            raise RuleError(reader.line_num, str(err)) from None
+    return tuple(rules)
+
+
+def _resolve(minutes, day, value):
+    """Minutes depuis minuit d'une valeur pour un index de jour, ou NO_TIME."""
+    prayer, offset = value
+    if prayer is None:
+        return offset
+    adhan = minutes[day * len(PRAYERS) + prayer]
+    if adhan == NO_TIME or not 0 <= adhan + offset < MINUTES_PER_DAY:
+        return NO_TIME
+    return adhan + offset
+
+
+def _summer_days(year, zone):
+    """Index des jours à l'heure d'été dans zone pour cette année."""
+    summer = set()
+    for day in range(DAYS_PER_YEAR):
+        reference = date(_REFERENCE_YEAR, 1, 1) + timedelta(days=day)
+        try:
+            local = datetime(year, reference.month, reference.day, 12, tzinfo=zone)
+        except ValueError:
+            # 29 février d'une année non bissextile : comme le 28
+            local = datetime(year, 2, 28, 12, tzinfo=zone)
+        if local.dst():
+            summer.add(day)
+    return summer
+
+
+def get_zone(name):
+    """ZoneInfo d'un nom de fuseau, ou None s'il est inconnu."""
+    try:
+        return ZoneInfo(name) if name else None
+    except (ZoneInfoNotFoundError, ValueError):
+        _LOGGER.warning("Fuseau horaire inconnu : %s", name)
+        return None
+
+
+def compile_special(minutes, friday_rules, events, year, zone=None, base=None):
+    """Construire le tableau annuel des horaires particuliers.
+
+    Les saisons sont celles de l'année year dans zone ; seules les prières
+    datées de cette année sont retenues. Sans règles du vendredi, les
+    créneaux du vendredi sont repris de base (tableau d'un fichier compilé)
+    s'il est donné. Renvoie (tableau, année), l'année étant None si la ville
+    n'a aucune prière datée : le tableau vaut alors pour toute année.
+    """
+    special = array("H", [NO_TIME]) * (DAYS_PER_YEAR * len(SPECIAL))
+    if base is not None and not friday_rules:
+        for slot in FRIDAY_SLOTS:
+            index = SPECIAL_INDEX[slot]
+            special[index::len(SPECIAL)] = array("H", base[index::len(SPECIAL)])
+    summer = None
+    for index, start, end, season, value in friday_rules:
+        days = range(start, end + 1) if start <= end else [*range(start, DAYS_PER_YEAR), *range(0, end + 1)]
+        if season is not None:
+            if summer is None:
+                summer = _summer_days(year, zone) if zone is not None else set()
+            days = [day for day in days if (day in summer) == (season == "summer")]
+        for day in days:
+            special[day * len(SPECIAL) + index] = _resolve(minutes, day, value)
+    for index, start, end, value in events:
+        current = max(date.fromordinal(start), date(year, 1, 1))
+        end = date.fromordinal(end)
+        while current <= end and current.year == year:
+            day = day_index(current)
+            special[day * len(SPECIAL) + index] = _resolve(minutes, day, value)
+            current += timedelta(days=1)
+    return special, year if events else None
@@ -0,0 +1,114 @@
+"""Compteurs et histogrammes du coût des mises à jour, par ville."""
+import time
+from bisect import bisect_left
+
+# Bornes des classes des histogrammes, en secondes (la dernière est ouverte)
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+
+class Histogram:
+    """Durées regroupées par classes, avec nombre, total et maximum."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self):
+        labels = [f"<={bound * 1e6:g}us" for bound in BUCKETS] + [f">{BUCKETS[-1] * 1e6:g}us"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else None,
+            "max_us": round(self.max * 1e6, 1),
+            "buckets": {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class CityStats:
+    """Coût du chargement, du calcul et de l'écriture des états d'une ville."""
+
+    __slots__ = ("load", "compute", "write", "writes", "noop_updates")
+
+    def __init__(self):
+        self.load = Histogram()
+        self.compute = Histogram()
+        self.write = Histogram()
+        self.writes = 0
+        # Mises à jour sans changement d'état, donc sans écriture
+        self.noop_updates = 0
+
+    def as_dict(self):
+        return {
+            "load": self.load.as_dict(),
+            "compute": self.compute.as_dict(),
+            "write": self.write.as_dict(),
+            "writes": self.writes,
+            "noop_updates": self.noop_updates,
+        }
+
+
+class Timer:
+    """Mesurer un bloc et l'ajouter à un histogramme ; sans histogramme, rien n'est mesuré."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        if self.histogram is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.histogram is not None:
+            self.histogram.add(time.perf_counter() - self.start)
+
+
+def ratio(hits, misses):
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+class PrayerStats:
+    """Statistiques de toutes les villes."""
+
+    def __init__(self):
+        self.cities = {}
+
+    def city(self, city):
+        stats = self.cities.get(city)
+        if stats is None:
+            stats = self.cities[city] = CityStats()
+        return stats
+
+    def as_dict(self, caches=(), cities=None):
+        """Vue sérialisable, limitée à certaines villes si cities est donné."""
+        return {
+            "caches": {
+                cache.base_path: {
+                    "cities": {"hits": cache.hits, "misses": cache.misses, "ratio": ratio(cache.hits, cache.misses)},
+                    "files": {
+                        "hits": cache.files.hits,
+                        "misses": cache.files.misses,
+                        "ratio": ratio(cache.files.hits, cache.files.misses),
+                    },
+                }
+                for cache in caches
+            },
+            "cities": {
+                city: stats.as_dict()
+                for city, stats in sorted(self.cities.items())
+                if cities is None or city in cities
+            },
+        }
@@ -0,0 +1,233 @@
+"""Horaires de prière compilés pour une année complète."""
+import csv
+import io
+import logging
+import os
+from array import array
+
+from .cache import read_file
+
+_LOGGER = logging.getLogger(__name__)
+
+PRAYERS = ("Fajr", "Shurouq", "Dhuhr", "Asr", "Maghrib", "Isha")
+PRAYER_INDEX = {prayer: index for index, prayer in enumerate(PRAYERS)}
+IQAMA_PRAYERS = ("Fajr", "Dhuhr", "Asr", "Maghrib", "Isha")
+
+# Horaires particuliers (voir special.py) : créneaux du vendredi, puis
+# prières datées, valables seulement pour l'année de compilation
+FRIDAY_SLOTS = ("Jumua", "Jumua 2")
+DATED_PRAYERS = ("Eid", "Taraweeh")
+SPECIAL = FRIDAY_SLOTS + DATED_PRAYERS
+SPECIAL_INDEX = {name: index for index, name in enumerate(SPECIAL)}
+
+# Une année bissextile de référence : chaque "MM-JJ" a toujours le même index.
+DAYS_PER_YEAR = 366
+_MONTH_LENGTHS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_MONTH_OFFSETS = tuple(sum(_MONTH_LENGTHS[:month]) for month in range(12))
+
+# Valeur réservée pour une heure absente du fichier.
+NO_TIME = 0xFFFF
+
+# Délai maximal d'une iqama après l'adhan, en minutes
+MAX_IQAMA_DELAY = 180
+
+# Chaînes "HH:MM" précalculées : aucun formatage lors des mises à jour.
+_HHMM = tuple(f"{minute // 60:02}:{minute % 60:02}" for minute in range(24 * 60))
+
+
+def day_index(day):
+    """Index (0..365) du jour dans l'année de référence."""
+    return _MONTH_OFFSETS[day.month - 1] + day.day - 1
+
+
+def parse_day(value):
+    """Index du jour pour une date "MM-JJ"."""
+    month, _, day = value.strip().partition("-")
+    return _MONTH_OFFSETS[int(month) - 1] + int(day) - 1
+
+
+def parse_time(value):
+    """Convertir "HH:MM" en minutes depuis minuit."""
+    hours, _, minutes = value.strip().partition(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_clock(value):
+    """Comme parse_time, pour une heure saisie : ValueError hors de 00:00 à 23:59."""
+    hours, _, minutes = value.partition(":")
+    if not (hours.strip().isdigit() and minutes.strip().isdigit()):
+        raise ValueError(f"heure invalide : {value!r}")
+    if int(hours) > 23 or int(minutes) > 59:
+        raise ValueError(f"heure hors limites : {value!r}")
+    return parse_time(value)
+
+
+def format_minutes(minutes):
+    """Convertir des minutes depuis minuit en "HH:MM"."""
+    if minutes is None or minutes == NO_TIME:
+        return None
+    return _HHMM[minutes % (24 * 60)]
+
+
+class Timetable:
+    """Horaires d'une ville, en minutes, indexés par (jour de l'année, prière)."""
+
+    def __init__(self, city, minutes, iqama=None, special=None):
+        self.city = city
+        self.minutes = minutes
+        # Année de calcul (ville avec localisation.csv), None pour des fichiers valables chaque année
+        self.year = None
+        # Même disposition que minutes ; Shurouq n'a pas d'iqama
+        self.iqama = iqama if iqama is not None else array("H", [NO_TIME]) * len(minutes)
+        # Horaires particuliers, indexés par (jour de l'année, SPECIAL)
+        self.special = special if special is not None else array("H", [NO_TIME]) * (DAYS_PER_YEAR * len(SPECIAL))
+        # Année des prières datées (Eid, Taraweeh) du tableau special
+        self.special_year = None
+
+    def get(self, day, prayer):
+        """Minutes depuis minuit de la prière pour ce jour, ou None."""
+        value = self.minutes[day_index(day) * len(PRAYERS) + PRAYER_INDEX[prayer]]
+        return None if value == NO_TIME else value
+
+    def get_iqama(self, day, prayer):
+        """Minutes depuis minuit de l'iqama pour ce jour, ou None."""
+        value = self.iqama[day_index(day) * len(PRAYERS) + PRAYER_INDEX[prayer]]
+        return None if value == NO_TIME else value
+
+    def get_special(self, day, name):
+        """Minutes depuis minuit d'un horaire particulier pour ce jour, ou None.
+
+        Un créneau du vendredi est renvoyé pour tout jour : c'est l'heure si
+        ce jour était un vendredi.
+        """
+        if name in DATED_PRAYERS and day.year != self.special_year:
+            return None
+        value = self.special[day_index(day) * len(SPECIAL) + SPECIAL_INDEX[name]]
+        return None if value == NO_TIME else value
+
+    def special_names(self):
+        """Horaires particuliers présents au moins un jour, dans l'ordre de SPECIAL."""
+        width = len(SPECIAL)
+        return tuple(
+            name for index, name in enumerate(SPECIAL)
+            if any(value != NO_TIME for value in self.special[index::width])
+        )
+
+    def __bool__(self):
+        return any(value != NO_TIME for value in self.minutes)
+
+    def has_iqama(self):
+        return any(value != NO_TIME for value in self.iqama)
+
+
+def parse_month(text):
+    """Analyser le contenu d'un MM.csv.
+
+    Renvoie des octets compacts : pour chaque ligne, l'index du jour suivi des
+    minutes de chaque prière, en uint16. Une ligne invalide est ignorée et
+    signalée avec son numéro (voir pipeline.py pour une validation complète).
+    """
+    rows = array("H")
+    reader = csv.DictReader(io.StringIO(text))
+    for row in reader:
+        try:
+            values = [parse_day(row["date"]), *(parse_time(row[prayer]) for prayer in PRAYERS)]
+        except (KeyError, ValueError, IndexError, TypeError, AttributeError, OverflowError):
+            _LOGGER.warning("Ligne %s invalide ignorée : %s", reader.line_num, row)
+            continue
+        if not 0 <= values[0] < DAYS_PER_YEAR or any(value >= 24 * 60 for value in values[1:]):
+            _LOGGER.warning("Ligne %s hors limites ignorée : %s", reader.line_num, row)
+            continue
+        rows.extend(values)
+    return rows.tobytes()
+
+
+def read_timetable(city_path, city, read=read_file, required=True):
+    """Charger les douze fichiers mensuels d'une ville en un seul tableau.
+
+    Avec required=False, un mois absent n'est pas une erreur : il sera calculé.
+    """
+    minutes = array("H", [NO_TIME]) * (DAYS_PER_YEAR * len(PRAYERS))
+    width = len(PRAYERS) + 1
+    for month in range(1, 13):
+        filename = os.path.join(city_path, f"{month:02}.csv")
+        _LOGGER.debug("Lecture des horaires de prière depuis : %s", filename)
+        rows = array("H")
+        try:
+            rows.frombytes(read(filename, parse_month))
+        except FileNotFoundError:
+            if required:
+                _LOGGER.error("Fichier non trouvé : %s", filename)
+            continue
+        for start in range(0, len(rows), width):
+            base = rows[start] * len(PRAYERS)
+            minutes[base:base + len(PRAYERS)] = rows[start + 1:start + width]
+    return Timetable(city, minutes)
+
+
+class RuleError(ValueError):
+    """Ligne invalide d'un fichier de règles."""
+
+    def __init__(self, line, message):
+        super().__init__(f"ligne {line} : {message}")
+        self.line = line
+        self.message = message
+
+
+def _parse_iqama_value(value):
+    """(heure fixe, minutes) d'une cellule de iqama.csv ; ValueError si hors limites."""
+    if ":" in value:
+        return True, parse_clock(value)
+    delay = int(value)
+    if not 0 <= delay <= MAX_IQAMA_DELAY:
+        raise ValueError(f"délai hors limites (0 à {MAX_IQAMA_DELAY} minutes) : {value!r}")
+    return False, delay
+
+
+def parse_iqama(text):
+    """Analyser iqama.csv en règles (premier jour, dernier jour, valeurs).
+
+    Chaque ligne donne, par prière, un délai en minutes après l'adhan ("10")
+    ou une heure fixe ("13:30"). Les colonnes facultatives start et end
+    ("MM-JJ") limitent la ligne à une période, qui peut passer le nouvel an ;
+    sans elles la ligne vaut pour toute l'année. Les lignes suivantes
+    remplacent les précédentes sur leur période. Une valeur invalide lève
+    RuleError avec le numéro de sa ligne.
+    """
+    rules = []
+    reader = csv.DictReader(io.StringIO(text))
+    for row in reader:
+        values = []
+        for prayer in IQAMA_PRAYERS:
+            value = (row.get(prayer) or "").strip()
+            if value:
+                try:
+                    fixed, minutes = _parse_iqama_value(value)
+                except ValueError as err:
+                    raise RuleError(reader.line_num, f"{prayer} : {err}") from None
+                values.append((PRAYER_INDEX[prayer], fixed, minutes))
+        start, end = (row.get("start") or "").strip(), (row.get("end") or "").strip()
+        try:
+            first_day, last_day = (parse_day(start), parse_day(end or start)) if start else (0, DAYS_PER_YEAR - 1)
+        except (ValueError, IndexError):
+            raise RuleError(reader.line_num, f"période invalide : {start!r} à {end!r}") from None
+        rules.append((first_day, last_day, tuple(values)))
+    return tuple(rules)
+
+
+def compile_iqama(minutes, rules):
+    """Construire le tableau annuel des iqamas à partir des règles.
+
+    Une heure fixe antérieure à l'adhan est ramenée à l'heure de l'adhan.
+    """
+    iqama = array("H", [NO_TIME]) * len(minutes)
+    for start, end, values in rules:
+        days = range(start, end + 1) if start <= end else [*range(start, DAYS_PER_YEAR), *range(0, end + 1)]
+        for day in days:
+            base = day * len(PRAYERS)
+            for index, fixed, value in values:
+                adhan = minutes[base + index]
+                if adhan == NO_TIME:
+                    continue
+                iqama[base + index] = max(value, adhan) if fixed else adhan + value
+    return iqama
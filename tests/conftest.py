@@ -0,0 +1,20 @@
+"""Fixtures communes : intégration personnalisée activée, données de test copiées."""
+import os
+import shutil
+
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "custom_components", "prayer_times", "data")
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    yield
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Copie des villes fournies (dar, oissel), modifiable par le test."""
+    path = tmp_path / "data"
+    shutil.copytree(DATA_DIR, path)
+    return str(path)
@@ -0,0 +1,37 @@
+"""Fichiers compilés : mêmes horaires que les CSV dont ils viennent."""
+import csv
+import os
+from datetime import date
+
+import pytest
+
+from custom_components.prayer_times.binary import read_city_binary
+from custom_components.prayer_times.build import build_all
+from custom_components.prayer_times.const import BINARY_FILE
+from custom_components.prayer_times.loader import load_city, load_csv_city, load_manifest
+from custom_components.prayer_times.timetable import PRAYERS, format_minutes
+
+
+@pytest.mark.parametrize("city", ["dar", "oissel"])
+def test_binary_round_trip(data_dir, city):
+    _, failures = build_all(data_dir, jobs=1, time_zone="Europe/Paris")
+    assert failures == {}
+    city_path = os.path.join(data_dir, city)
+
+    compiled = read_city_binary(os.path.join(city_path, BINARY_FILE), city, load_manifest(data_dir)[city])
+    source = load_csv_city(city_path, city, time_zone="Europe/Paris").timetable
+
+    assert list(compiled.minutes) == list(source.minutes)
+    assert list(compiled.iqama) == list(source.iqama)
+    assert list(compiled.special) == list(source.special)
+    assert compiled.special_year == source.special_year
+
+    # Chaque ligne des CSV se retrouve telle quelle dans le fichier compilé
+    timetable = load_city(data_dir, city, time_zone="Europe/Paris", manifest=load_manifest(data_dir)).timetable
+    for month in range(1, 13):
+        with open(os.path.join(city_path, f"{month:02}.csv"), encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                day = date(2024, month, int(row["date"][3:]))
+                assert [format_minutes(timetable.get(day, prayer)) for prayer in PRAYERS] == [
+                    row[prayer] for prayer in PRAYERS
+                ]
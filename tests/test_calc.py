@@ -0,0 +1,69 @@
+"""Horaires calculés : valeurs connues et paramètres invalides."""
+import os
+import shutil
+from datetime import date
+
+import pytest
+
+from custom_components.prayer_times.calc import compute_year
+from custom_components.prayer_times.loader import CityCache, parse_location
+from custom_components.prayer_times.timetable import PRAYERS, day_index
+
+HEADER = "latitude,longitude,calculation_method,asr,high_latitude,timezone\n"
+
+
+def day_times(minutes, day):
+    base = day_index(day) * len(PRAYERS)
+    return dict(zip(PRAYERS, minutes[base:base + len(PRAYERS)]))
+
+
+@pytest.mark.parametrize(
+    ("location", "day", "expected"),
+    [
+        # Paris aux solstices : lever et coucher du soleil publiés, heure locale
+        ((48.8566, 2.3522, "MWL", "standard", "night_middle", "Europe/Paris"), date(2024, 6, 21),
+         {"Shurouq": 5 * 60 + 47, "Dhuhr": 13 * 60 + 53, "Maghrib": 21 * 60 + 58}),
+        ((48.8566, 2.3522, "MWL", "standard", "night_middle", "Europe/Paris"), date(2024, 12, 21),
+         {"Shurouq": 8 * 60 + 42, "Dhuhr": 12 * 60 + 49, "Maghrib": 16 * 60 + 56}),
+        # La Mecque à l'équinoxe : Isha 90 minutes après Maghrib
+        ((21.4225, 39.8262, "Makkah", "standard", "none", "Asia/Riyadh"), date(2024, 3, 20),
+         {"Shurouq": 6 * 60 + 25, "Maghrib": 18 * 60 + 32, "Isha": 20 * 60 + 2}),
+    ],
+)
+def test_known_location(location, day, expected):
+    latitude, longitude, method, asr, high_latitude, time_zone = location
+    times = day_times(compute_year(latitude, longitude, day.year, method, asr, high_latitude, time_zone), day)
+    for prayer, minutes in expected.items():
+        assert abs(times[prayer] - minutes) <= 2, prayer
+    # Isha peut passer minuit en été à Paris
+    assert times["Fajr"] < times["Shurouq"] < times["Dhuhr"] < times["Asr"] < times["Maghrib"]
+
+
+@pytest.mark.parametrize(
+    "row",
+    [
+        "49.34,1.09,Unknown,standard,night_middle,Europe/Paris",
+        "49.34,1.09,UOIF,shafi,night_middle,Europe/Paris",
+        "49.34,1.09,UOIF,standard,midnight,Europe/Paris",
+        "49.34,1.09,UOIF,standard,night_middle,Europe/Oissel",
+        "149.34,1.09,UOIF,standard,night_middle,Europe/Paris",
+    ],
+)
+def test_invalid_location_is_rejected(row):
+    with pytest.raises(ValueError):
+        parse_location(f"{HEADER}{row}\n")
+
+
+def test_invalid_location_skips_only_its_city(data_dir):
+    # Ville sans fichiers mensuels, au fuseau inconnu
+    path = f"{data_dir}/calcul"
+    os.mkdir(path)
+    shutil.copy(f"{data_dir}/oissel/iqama.csv", path)
+    with open(f"{path}/localisation.csv", "w", encoding="utf-8") as file:
+        file.write(f"{HEADER}49.34,1.09,UOIF,standard,night_middle,Europe/Oissel\n")
+
+    cities = CityCache(data_dir).load_all()
+
+    assert not cities["calcul"].timetable.has_iqama()
+    assert cities["oissel"].timetable.has_iqama()
+    assert cities["dar"].timetable.has_iqama()
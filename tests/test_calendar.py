@@ -0,0 +1,41 @@
+"""Calendrier : les mois sont calculés dans l'exécuteur, jamais dans la boucle."""
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+from custom_components.prayer_times import calendar
+from custom_components.prayer_times.const import DOMAIN
+
+
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+async def test_months_are_built_off_the_event_loop(hass, data_dir):
+    loop_thread = threading.get_ident()
+    threads = []
+
+    class RecordingMonthEvents(calendar.MonthEvents):
+        def __init__(self, *args):
+            threads.append(threading.get_ident())
+            super().__init__(*args)
+
+    with patch("custom_components.prayer_times.sensor.BASE_DATA_PATH", data_dir), patch.object(
+        calendar, "MonthEvents", RecordingMonthEvents
+    ):
+        assert await async_setup_component(hass, DOMAIN, {DOMAIN: {}})
+        await hass.async_block_till_done()
+
+        # Mois en cours et suivant préparés à l'ajout de l'entité
+        assert hass.states.get("calendar.oissel_prayers").attributes.get("message")
+
+        entity = hass.data["calendar"].get_entity("calendar.oissel_prayers")
+        now = dt_util.now()
+        events = await entity.async_get_events(hass, now + timedelta(days=90), now + timedelta(days=92))
+        await hass.async_block_till_done()
+
+    assert events
+    assert threads
+    assert loop_thread not in threads
@@ -0,0 +1,130 @@
+"""Configuration par l'interface et options d'une mosquée."""
+import shutil
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant import config_entries
+from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.helpers import entity_registry as er
+from homeassistant.setup import async_setup_component
+
+from custom_components.prayer_times import CONFIG_SCHEMA
+from custom_components.prayer_times.const import CONF_ANNOUNCEMENTS, CONF_CITY, CONF_DATA_DIR, CONF_UPCOMING_LEAD, DOMAIN
+
+
+async def _async_choose_city(hass, data_dir, city):
+    result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+    assert result["type"] == FlowResultType.FORM
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {CONF_DATA_DIR: data_dir})
+    assert result["step_id"] == "city"
+    return await hass.config_entries.flow.async_configure(result["flow_id"], {CONF_CITY: city})
+
+
+async def test_user_flow_aborts_on_duplicate(hass, data_dir):
+    with patch("custom_components.prayer_times.async_setup_entry", return_value=True):
+        result = await _async_choose_city(hass, data_dir, "oissel")
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        assert result["data"] == {CONF_CITY: "oissel", CONF_DATA_DIR: data_dir}
+
+        # Même mosquée du même répertoire : abandon
+        result = await _async_choose_city(hass, data_dir, "oissel")
+        assert result["type"] == FlowResultType.ABORT
+        assert result["reason"] == "already_configured"
+
+        # Autre mosquée : nouvelle entrée
+        result = await _async_choose_city(hass, data_dir, "dar")
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        await hass.async_block_till_done()
+
+    assert len(hass.config_entries.async_entries(DOMAIN)) == 2
+
+
+async def test_user_flow_rejects_missing_directory(hass, tmp_path):
+    result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {CONF_DATA_DIR: str(tmp_path / "absent")})
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {CONF_DATA_DIR: "data_dir_not_found"}
+
+
+async def test_options_flow(hass, data_dir):
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id=f"{data_dir}:oissel",
+        data={CONF_CITY: "oissel", CONF_DATA_DIR: data_dir},
+        options={CONF_UPCOMING_LEAD: [15]},
+    )
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    assert result["type"] == FlowResultType.FORM
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_ANNOUNCEMENTS: True, CONF_UPCOMING_LEAD: "5, 30"}
+    )
+
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert entry.options == {CONF_ANNOUNCEMENTS: True, CONF_UPCOMING_LEAD: [30, 5]}
+
+
+async def test_options_flow_rejects_invalid_lead(hass, data_dir):
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_CITY: "oissel", CONF_DATA_DIR: data_dir})
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_ANNOUNCEMENTS: True, CONF_UPCOMING_LEAD: "500"}
+    )
+
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {CONF_UPCOMING_LEAD: "invalid_lead"}
+
+
+async def test_same_city_from_two_directories(hass, data_dir, tmp_path):
+    other_dir = str(tmp_path / "other")
+    shutil.copytree(data_dir, other_dir)
+    entries = [
+        MockConfigEntry(domain=DOMAIN, unique_id=f"{path}:oissel", data={CONF_CITY: "oissel", CONF_DATA_DIR: path})
+        for path in (data_dir, other_dir)
+    ]
+    for entry in entries:
+        entry.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    # Chaque entrée a ses propres entités, sans conflit d'unique_id
+    registry = er.async_get(hass)
+    for entry in entries:
+        assert entry.state is config_entries.ConfigEntryState.LOADED
+        entity_id = registry.async_get_entity_id("sensor", DOMAIN, f"{entry.entry_id}_Fajr")
+        assert hass.states.get(entity_id).state != "unavailable"
+        assert registry.async_get_entity_id("calendar", DOMAIN, f"{entry.entry_id}_prayers") is not None
+    assert len(hass.states.async_entity_ids("calendar")) == 2
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"upcoming_lead": [15, 500]},
+        {"idle_timeout": -1},
+        {"lazy_load": "peut-être"},
+        {"remote": [{"city": "oissel", "server": "https://mawaqit.net"}]},
+        {"remote": [{"city": "oissel", "server": "https://mawaqit.net", "uuid": "x", "token": "y"}]},
+    ],
+)
+async def test_yaml_config_is_validated(hass, config):
+    assert not await async_setup_component(hass, DOMAIN, {DOMAIN: config})
+
+
+def test_yaml_config_schema():
+    config = CONFIG_SCHEMA(
+        {
+            DOMAIN: {
+                "upcoming_lead": "5",
+                "remote": {"city": "oissel", "server": "https://mawaqit.net", "uuid": "x", "user": "a", "password": "b"},
+            }
+        }
+    )
+    assert config[DOMAIN]["upcoming_lead"] == [5]
+    assert config[DOMAIN]["remote"][0]["user"] == "a"
+    assert CONFIG_SCHEMA({DOMAIN: None}) == {DOMAIN: None}
@@ -0,0 +1,72 @@
+"""Coordinateur d'une ville : rafraîchissement demandé par Home Assistant, changement d'année."""
+import os
+import shutil
+from datetime import date
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
+
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+from custom_components.prayer_times.build import build_city, write_manifest
+from custom_components.prayer_times.calc import compute_year
+from custom_components.prayer_times.const import CONF_CITY, CONF_DATA_DIR, DOMAIN
+from custom_components.prayer_times.daily import async_daily_update
+from custom_components.prayer_times.timetable import PRAYERS, day_index
+
+
+async def test_update_entity_keeps_next_salat(hass, data_dir):
+    assert await async_setup_component(hass, "homeassistant", {})
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_CITY: "oissel", CONF_DATA_DIR: data_dir})
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    before = hass.states.get("sensor.oissel_next_salat_name").state
+    assert before not in (None, "unknown")
+
+    await hass.services.async_call(
+        "homeassistant", "update_entity", {"entity_id": "sensor.oissel_next_salat_name"}, blocking=True
+    )
+    await hass.async_block_till_done()
+
+    assert hass.states.get("sensor.oissel_next_salat_name").state == before
+    assert hass.states.get("sensor.oissel_next_salat_time").state not in (None, "unknown")
+
+
+async def test_computed_city_rolls_into_new_year(hass, data_dir, freezer):
+    freezer.move_to("2025-12-31 10:00:00+01:00")
+    # Ville sans fichiers mensuels, compilée en 2025
+    path = os.path.join(data_dir, "calcul")
+    os.mkdir(path)
+    shutil.copy(os.path.join(data_dir, "oissel", "iqama.csv"), path)
+    with open(os.path.join(path, "localisation.csv"), "w", encoding="utf-8") as file:
+        file.write("latitude,longitude,calculation_method,asr,high_latitude,timezone\n")
+        file.write("49.34,1.09,UOIF,standard,night_middle,Europe/Paris\n")
+    city, entry, errors = build_city(data_dir, "calcul")
+    assert errors == []
+    write_manifest(data_dir, {city: entry})
+
+    config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_CITY: "calcul", CONF_DATA_DIR: data_dir})
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    domain_data = hass.data[DOMAIN]
+    coordinator = domain_data["coordinators"][config_entry.entry_id]
+    assert coordinator.city_data.timetable.year == 2025
+
+    # La veille du nouvel an, la tâche quotidienne prépare 2026
+    await async_daily_update(hass, domain_data)
+    await hass.async_block_till_done()
+    assert coordinator.city_data.timetable.year == 2025
+
+    freezer.move_to("2026-01-01 00:00:30+01:00")
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+
+    timetable = coordinator.city_data.timetable
+    assert timetable.year == 2026
+    assert coordinator.data.day == date(2026, 1, 1)
+    computed = compute_year(49.34, 1.09, 2026, "UOIF", "standard", "night_middle", "Europe/Paris")
+    base = day_index(date(2026, 1, 1)) * len(PRAYERS)
+    assert coordinator.data.adhan["Fajr"] == computed[base]
+    assert timetable.has_iqama()
@@ -0,0 +1,22 @@
+"""Diagnostics d'une entrée de configuration."""
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.prayer_times.const import CONF_CITY, CONF_DATA_DIR, DOMAIN
+from custom_components.prayer_times.diagnostics import async_get_config_entry_diagnostics
+
+
+async def test_diagnostics_count_listeners(hass, data_dir):
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_CITY: "oissel", CONF_DATA_DIR: data_dir})
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, entry)
+    coordinator = hass.data[DOMAIN]["coordinators"][entry.entry_id]
+
+    assert diagnostics["loaded"] is True
+    # Capteurs activés par défaut et calendrier de la ville
+    assert diagnostics["listeners"] == coordinator.listener_count > 0
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,69 @@
+"""Événements d'une journée : jours de changement d'heure, iqama après minuit."""
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from custom_components.prayer_times.announcements import EVENT_IQAMA, day_announcements
+from custom_components.prayer_times.coordinator import DaySchedule
+from custom_components.prayer_times.events import ADHAN, IQAMA, SHUROUQ, DayEvents, local_epoch, next_event_at
+
+PARIS = ZoneInfo("Europe/Paris")
+DAY = date(2026, 6, 20)
+
+ADHAN_TIMES = {"Fajr": 200, "Shurouq": 340, "Dhuhr": 830, "Asr": 1060, "Maghrib": 1320, "Isha": 1430}
+IQAMA_TIMES = {"Fajr": 210, "Dhuhr": 840, "Asr": 1070, "Maghrib": 1325, "Isha": 1445}
+
+
+def schedule(day):
+    return DaySchedule(day, ADHAN_TIMES, IQAMA_TIMES, {}, {}, PARIS)
+
+
+def test_spring_forward_day():
+    # 29 mars 2026 : 02:00 devient 03:00 à Paris
+    day = date(2026, 3, 29)
+    events = DayEvents(day, [(60, ADHAN, "Fajr"), (150, IQAMA, "Fajr"), (240, SHUROUQ, "Shurouq")], PARIS)
+    one, missing, four = events.epochs
+    # 01:00 et 04:00 ne sont séparées que de deux heures ; 02:30 n'existe pas et devient 03:30
+    assert four - one == 2 * 3600
+    assert datetime.fromtimestamp(missing, PARIS).strftime("%H:%M") == "03:30"
+    # Les minutes restantes comptent l'heure perdue
+    assert next_event_at(events, None, one, {SHUROUQ})[3] == 120
+
+
+def test_fall_back_day():
+    # 25 octobre 2026 : 03:00 redevient 02:00 à Paris
+    day = date(2026, 10, 25)
+    events = DayEvents(day, [(60, ADHAN, "Fajr"), (150, IQAMA, "Fajr"), (240, SHUROUQ, "Shurouq")], PARIS)
+    one, twice, four = events.epochs
+    assert four - one == 4 * 3600
+    # 02:30 vécue deux fois : la première, encore à l'heure d'été
+    assert datetime.fromtimestamp(twice, timezone.utc).strftime("%H:%M") == "00:30"
+    assert next_event_at(events, None, one, {SHUROUQ})[3] == 240
+
+
+def test_iqama_after_midnight_is_kept():
+    events = DayEvents(DAY, [(1430, ADHAN, "Isha"), (1445, IQAMA, "Isha")], PARIS)
+    assert events.events[-1] == (1445, IQAMA, "Isha")
+    # 00:05 le lendemain, heure de Paris
+    assert events.epochs[-1] == int(datetime(2026, 6, 21, 0, 5, tzinfo=PARIS).timestamp())
+
+
+def test_next_event_after_isha_is_its_iqama():
+    today, tomorrow = schedule(DAY), schedule(DAY + timedelta(days=1))
+    timestamp = local_epoch(DAY, 1435, PARIS)
+    minute, kind, name, remaining, epoch = next_event_at(today.events, tomorrow.events, timestamp)
+    assert (minute, kind, name, remaining) == (1445, IQAMA, "Isha", 10)
+    assert epoch == local_epoch(DAY + timedelta(days=1), 5, PARIS)
+
+
+def test_iqama_after_midnight_is_announced_the_next_day():
+    yesterday, today, tomorrow = (schedule(DAY + timedelta(days=offset)) for offset in range(3))
+    late = local_epoch(DAY + timedelta(days=1), 5, PARIS)
+
+    announcements = day_announcements("oissel", today, tomorrow, (15,), PARIS, yesterday)
+    assert (late, EVENT_IQAMA, {"city": "oissel", "prayer": "Isha", "kind": IQAMA, "time": "00:05"}) in announcements
+    # Le jour même, elle sort de la fenêtre : annoncée une seule fois
+    assert all(epoch < late for epoch, _, _ in day_announcements("oissel", yesterday, today, (15,), PARIS))
+    assert all(
+        datetime.fromtimestamp(epoch, timezone.utc).astimezone(PARIS).date() == today.day
+        for epoch, _, _ in announcements
+    )
@@ -0,0 +1,27 @@
+"""Règles d'iqama : valeurs invalides signalées avec leur ligne."""
+import pytest
+
+from custom_components.prayer_times.loader import CityCache
+from custom_components.prayer_times.pipeline import process_city
+from custom_components.prayer_times.timetable import RuleError, parse_iqama
+
+HEADER = "Fajr,Dhuhr,Asr,Maghrib,Isha,start,end\n"
+
+
+@pytest.mark.parametrize("row", ["10,10,10,0,-5,,", "10,10,10,0,70000,,", "10,25:00,10,0,10,,", "10,10,10,0,10,13-01,"])
+def test_invalid_iqama_row_is_reported(row):
+    with pytest.raises(RuleError) as err:
+        parse_iqama(f"{HEADER}10,10,10,0,10,,\n{row}\n")
+    assert err.value.line == 3
+
+
+def test_invalid_iqama_skips_only_its_city(data_dir):
+    with open(f"{data_dir}/oissel/iqama.csv", "w", encoding="utf-8") as file:
+        file.write(f"{HEADER}10,10,10,0,-5,,\n")
+
+    cities = CityCache(data_dir).load_all()
+
+    assert not cities["oissel"].timetable.has_iqama()
+    assert cities["dar"].timetable.has_iqama()
+    _, _, errors = process_city(f"{data_dir}/oissel")
+    assert errors == [f"{data_dir}/oissel/iqama.csv:2: Isha : délai hors limites (0 à 180 minutes) : '-5'"]
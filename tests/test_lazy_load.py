@@ -0,0 +1,35 @@
+"""Chargement paresseux : une ville sans entité active n'est jamais lue."""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.helpers import entity_registry as er
+from homeassistant.setup import async_setup_component
+
+from custom_components.prayer_times.const import DOMAIN
+from custom_components.prayer_times.loader import read_special_names
+from custom_components.prayer_times.sensor import city_sensors
+
+
+# Les calendriers de la plateforme YAML gardent leurs alarmes jusqu'à l'arrêt
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+async def test_disabled_city_is_never_loaded(hass, data_dir):
+    registry = er.async_get(hass)
+    # Toutes les entités d'oissel désactivées avant le démarrage
+    special = read_special_names(f"{data_dir}/oissel")
+    for entity in city_sensors(SimpleNamespace(city="oissel", unique_key=f"{data_dir}:oissel"), special):
+        registry.async_get_or_create(
+            "sensor", DOMAIN, entity.unique_id, disabled_by=er.RegistryEntryDisabler.USER
+        )
+    registry.async_get_or_create("calendar", DOMAIN, f"{data_dir}:oissel_prayers", disabled_by=er.RegistryEntryDisabler.USER)
+
+    with patch("custom_components.prayer_times.sensor.BASE_DATA_PATH", data_dir):
+        assert await async_setup_component(hass, DOMAIN, {DOMAIN: {"lazy_load": True}})
+        await hass.async_block_till_done()
+
+    cache = hass.data[DOMAIN]["caches"][data_dir]
+    assert cache.get("oissel") is None
+    assert cache.get("dar") is not None
+    assert hass.states.get("sensor.dar_fajr") is not None
+    assert hass.states.get("sensor.oissel_fajr") is None
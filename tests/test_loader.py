@@ -0,0 +1,50 @@
+"""CityCache : chargements simultanés depuis plusieurs fils de l'exécuteur."""
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from custom_components.prayer_times.loader import CityCache, list_cities
+
+
+def test_concurrent_loads(data_dir, tmp_path):
+    # Assez de villes pour forcer des évictions pendant les chargements
+    for index in range(12):
+        shutil.copytree(os.path.join(data_dir, "oissel"), os.path.join(data_dir, f"ville_{index:02}"))
+    cities = list_cities(data_dir)
+    cache_file = str(tmp_path / "prayer_times.cache")
+    cache = CityCache(data_dir, cache_file, max_idle=3)
+
+    def work(offset):
+        for city in cities[offset % len(cities)::3]:
+            data = cache.load(city)
+            assert data.city == city and data.timetable.has_iqama()
+            cache.save()
+        return True
+
+    with ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(work, range(32)))
+
+    # Un seul fichier de cache, sans fichier temporaire, relisible
+    assert sorted(os.listdir(tmp_path)) == ["data", "prayer_times.cache"]
+    restored = CityCache(data_dir, cache_file)
+    restored.load("oissel")
+    assert restored.files.hits > 0
+
+
+def test_pinned_city_is_reloaded_after_eviction(data_dir):
+    cache = CityCache(data_dir, max_idle=0)
+    # Chargée avant que ses entités ne l'épinglent : évincée aussitôt
+    assert cache.load("oissel").timetable.has_iqama()
+    assert cache.get("oissel") is None
+    cache.pin("oissel")
+    assert cache.reload_changed() == {}
+
+    path = os.path.join(data_dir, "oissel", "iqama.csv")
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text.replace("10", "12", 1))
+
+    changed = cache.reload_changed()
+    assert list(changed) == ["oissel"]
+    assert cache.get("oissel") is changed["oissel"]
@@ -0,0 +1,122 @@
+"""Horaires distants : téléchargements conditionnels et écriture des calendriers."""
+import json
+import os
+from datetime import date, timedelta
+from http import HTTPStatus
+
+import aiohttp
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.prayer_times.build import build_all
+from custom_components.prayer_times.loader import load_city, load_manifest
+from custom_components.prayer_times.remote import STORAGE_KEY, RemoteSource, RemoteUpdater, write_calendars
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def calendar_body(fajr):
+    """Calendrier Mawaqit d'une année bissextile, Fajr à l'heure donnée."""
+    months = [{} for _ in range(12)]
+    day = date(2024, 1, 1)
+    while day.year == 2024:
+        months[day.month - 1][str(day.day)] = [fajr, "07:30", "13:00", "16:00", "19:00", "20:30"]
+        day += timedelta(days=1)
+    return json.dumps({"calendar": months}).encode()
+
+
+def test_remote_calendar_recompiles_manifest_city(data_dir):
+    build_all(data_dir, ["oissel"], jobs=1)
+    assert "oissel" in load_manifest(data_dir)
+    source = RemoteSource("oissel", "https://mawaqit.example", "uuid", data_dir)
+
+    errors = write_calendars([(source, calendar_body("05:43"))], "Europe/Paris")
+
+    assert errors == {source.key: []}
+    # Le fichier compilé suit les CSV écrits : la ville n'est pas relue depuis l'ancien binaire
+    data = load_city(data_dir, "oissel", time_zone="Europe/Paris", manifest=load_manifest(data_dir))
+    assert data.timetable.get(date(2026, 3, 1), "Fajr") == 5 * 60 + 43
+    # Aucun fichier temporaire laissé
+    assert sorted(name for name in os.listdir(source.path) if ".csv." in name) == []
+
+
+def test_invalid_remote_calendar_keeps_files(data_dir):
+    source = RemoteSource("oissel", "https://mawaqit.example", "uuid", data_dir)
+    with open(os.path.join(source.path, "01.csv"), encoding="utf-8") as file:
+        before = file.read()
+
+    errors = write_calendars([(source, calendar_body("25:99"))])
+
+    assert errors[source.key]
+    with open(os.path.join(source.path, "01.csv"), encoding="utf-8") as file:
+        assert file.read() == before
+
+
+def read_month(source):
+    with open(os.path.join(source.path, "01.csv"), encoding="utf-8") as file:
+        return file.read()
+
+
+async def test_unchanged_calendar_is_not_rewritten(hass, data_dir, aioclient_mock):
+    source = RemoteSource("oissel", "https://mawaqit.example", "uuid", data_dir, api="token")
+    aioclient_mock.get(
+        source.url, content=calendar_body("05:43"), headers={"ETag": ETAG, "Last-Modified": LAST_MODIFIED}
+    )
+    updater = RemoteUpdater(hass, [source])
+    assert await updater.async_refresh() == ["oissel"]
+    stat = os.stat(os.path.join(source.path, "01.csv"))
+
+    aioclient_mock.clear_requests()
+    aioclient_mock.get(source.url, status=HTTPStatus.NOT_MODIFIED)
+    assert await updater.async_refresh() == []
+
+    headers = aioclient_mock.mock_calls[0][3]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+    assert headers["Api-Access-Token"] == "token"
+    # Réponse 304 : aucun fichier réécrit
+    assert os.stat(os.path.join(source.path, "01.csv")).st_mtime_ns == stat.st_mtime_ns
+
+
+async def test_failed_mosque_does_not_block_the_others(hass, data_dir, aioclient_mock):
+    down = RemoteSource("oissel", "https://down.example", "uuid", data_dir)
+    broken = RemoteSource("oissel", "https://broken.example", "uuid", f"{data_dir}/copie")
+    working = RemoteSource("dar", "https://mawaqit.example", "uuid", data_dir)
+    aioclient_mock.get(down.url, exc=aiohttp.ClientError("connexion refusée"))
+    aioclient_mock.get(broken.url, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+    aioclient_mock.get(working.url, content=calendar_body("05:43"), headers={"ETag": ETAG})
+    before = read_month(down)
+
+    updater = RemoteUpdater(hass, [down, broken, working])
+    assert await updater.async_refresh() == ["dar"]
+
+    assert read_month(down) == before
+    assert read_month(working).splitlines()[1].split(",")[1] == "05:43"
+    assert not os.path.exists(broken.path)
+
+
+async def test_validators_are_saved_only_after_a_write(hass, hass_storage, data_dir, aioclient_mock):
+    invalid = RemoteSource("oissel", "https://mawaqit.example", "oissel", data_dir)
+    valid = RemoteSource("dar", "https://mawaqit.example", "dar", data_dir)
+    aioclient_mock.get(invalid.url, content=calendar_body("25:99"), headers={"ETag": '"invalide"'})
+    aioclient_mock.get(valid.url, content=calendar_body("05:43"), headers={"ETag": ETAG})
+
+    updater = RemoteUpdater(hass, [invalid, valid])
+    assert await updater.async_refresh() == ["dar"]
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=11))
+    await hass.async_block_till_done()
+
+    # Calendrier refusé : pas de validateurs, il sera retéléchargé en entier
+    validators = hass_storage[STORAGE_KEY]["data"]["validators"]
+    assert invalid.key not in validators
+    assert validators[valid.key]["etag"] == ETAG
+
+    aioclient_mock.clear_requests()
+    aioclient_mock.get(invalid.url, content=calendar_body("05:50"))
+    aioclient_mock.get(valid.url, status=HTTPStatus.NOT_MODIFIED)
+    assert await updater.async_refresh() == ["oissel"]
+    calls = {str(url): headers for _, url, _, headers in aioclient_mock.mock_calls}
+    assert "If-None-Match" not in calls[invalid.url]
+    assert calls[valid.url]["If-None-Match"] == ETAG
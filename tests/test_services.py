@@ -0,0 +1,57 @@
+"""Service get_schedule et requêtes groupées sur des plages de dates."""
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.helpers import entity_registry as er
+from homeassistant.setup import async_setup_component
+
+from custom_components.prayer_times.const import DOMAIN
+from custom_components.prayer_times.loader import load_city, read_special_names
+from custom_components.prayer_times.query import get_schedule
+from custom_components.prayer_times.sensor import city_sensors
+
+
+def test_feb_29_only_in_leap_years(data_dir):
+    timetable = load_city(data_dir, "oissel").timetable
+    leap_dates, leap = get_schedule({"oissel": timetable}, date(2024, 2, 28), date(2024, 3, 1), ("Fajr",))
+    dates, common = get_schedule({"oissel": timetable}, date(2025, 2, 28), date(2025, 3, 1), ("Fajr",))
+
+    assert leap_dates == [date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)]
+    assert dates == [date(2025, 2, 28), date(2025, 3, 1)]
+    assert list(leap["oissel"]["Fajr"]) == [
+        timetable.get(day, "Fajr") for day in (date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1))
+    ]
+    # Le 29 février est sauté : le 1er mars suit le 28 février
+    assert list(common["oissel"]["Fajr"]) == [leap["oissel"]["Fajr"][0], leap["oissel"]["Fajr"][2]]
+
+
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+async def test_get_schedule_does_not_keep_cities_loaded(hass, data_dir):
+    # Aucune entité d'oissel : la ville n'est pas chargée au démarrage
+    registry = er.async_get(hass)
+    for entity in city_sensors(SimpleNamespace(city="oissel", unique_key=f"{data_dir}:oissel"), read_special_names(f"{data_dir}/oissel")):
+        registry.async_get_or_create("sensor", DOMAIN, entity.unique_id, disabled_by=er.RegistryEntryDisabler.USER)
+    registry.async_get_or_create("calendar", DOMAIN, f"{data_dir}:oissel_prayers", disabled_by=er.RegistryEntryDisabler.USER)
+    with patch("custom_components.prayer_times.sensor.BASE_DATA_PATH", data_dir):
+        assert await async_setup_component(hass, DOMAIN, {DOMAIN: {"lazy_load": True}})
+        await hass.async_block_till_done()
+    cache = hass.data[DOMAIN]["caches"][data_dir]
+
+    with patch.object(cache, "save", wraps=cache.save) as save:
+        response = await hass.services.async_call(
+            DOMAIN,
+            "get_schedule",
+            {"cities": ["oissel", "dar"], "start_date": "2024-02-28", "end_date": "2024-03-01", "prayers": ["Fajr"]},
+            blocking=True,
+            return_response=True,
+        )
+
+    assert response["dates"] == ["2024-02-28", "2024-02-29", "2024-03-01"]
+    assert list(response["cities"]) == ["oissel", "dar"]
+    assert len(response["cities"]["oissel"]["Fajr"]) == 3
+    # Une seule lecture groupée, et la ville reste hors mémoire
+    assert save.call_count == 1
+    assert cache.get("oissel") is None
@@ -0,0 +1,86 @@
+"""Redémarrage à partir de l'instantané, puis vérification des fichiers."""
+import asyncio
+import csv
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+from custom_components.prayer_times import loader
+from custom_components.prayer_times.const import DOMAIN
+from custom_components.prayer_times.coordinator import city_zone, compute_day
+from custom_components.prayer_times.snapshot import STORAGE_KEY, STORAGE_VERSION, TimetableSnapshot, data_version
+
+
+def saved_snapshot(hass, data_dir):
+    """Contenu de .storage/prayer_times.snapshot pour les fichiers actuels."""
+    snapshot = TimetableSnapshot(hass)
+    for city in ("dar", "oissel"):
+        data = loader.load_city(data_dir, city, time_zone=hass.config.time_zone)
+        zone = city_zone(data)
+        schedule = compute_day(data, dt_util.now(zone).date(), zone)
+        snapshot.async_update(f"{data_dir}:{city}", data, data_version(data), schedule)
+    return {"version": STORAGE_VERSION, "minor_version": 1, "key": STORAGE_KEY, "data": snapshot._data_to_save()}
+
+
+def set_fajr(city_path, value):
+    """Même Fajr tous les jours de l'année."""
+    for month in range(1, 13):
+        path = os.path.join(city_path, f"{month:02}.csv")
+        with open(path, encoding="utf-8") as file:
+            rows = list(csv.reader(file))
+        for row in rows[1:]:
+            row[1] = value
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            csv.writer(file).writerows(rows)
+
+
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+async def test_boot_from_snapshot_then_verify(hass, hass_storage, data_dir):
+    hass_storage[STORAGE_KEY] = saved_snapshot(hass, data_dir)
+    versions = {key: entry["version"] for key, entry in hass_storage[STORAGE_KEY]["data"]["cities"].items()}
+    set_fajr(os.path.join(data_dir, "oissel"), "03:03")
+
+    # Les lectures de fichiers attendent que le test les libère
+    release = threading.Event()
+    reads = []
+
+    def gated_load_city(*args, **kwargs):
+        assert release.wait(5)
+        reads.append(args[1])
+        return load_city(*args, **kwargs)
+
+    load_city = loader.load_city
+    with patch.object(loader, "load_city", gated_load_city), patch(
+        "custom_components.prayer_times.sensor.BASE_DATA_PATH", data_dir
+    ):
+        assert await async_setup_component(hass, DOMAIN, {DOMAIN: {}})
+        for _ in range(100):
+            if hass.states.get("sensor.oissel_fajr") is not None:
+                break
+            await asyncio.sleep(0)
+
+        # Entités créées depuis l'instantané, avant toute lecture
+        assert reads == []
+        before = hass.states.get("sensor.oissel_fajr").state
+        assert before not in (None, "unknown", "03:03")
+        assert hass.states.get("sensor.dar_fajr") is not None
+
+        release.set()
+        await hass.async_block_till_done()
+
+    assert sorted(reads) == ["dar", "oissel"]
+    assert hass.states.get("sensor.oissel_fajr").state == "03:03"
+
+    # Seule la ville modifiée remplace son instantané
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_FINAL_WRITE)
+    await hass.async_block_till_done()
+    cities = hass_storage[STORAGE_KEY]["data"]["cities"]
+    assert cities[f"{data_dir}:dar"]["version"] == versions[f"{data_dir}:dar"]
+    assert cities[f"{data_dir}:oissel"]["version"] != versions[f"{data_dir}:oissel"]
+    assert cities[f"{data_dir}:oissel"]["today"]["adhan"]["Fajr"] == 3 * 60 + 3
@@ -0,0 +1,107 @@
+"""Règles du vendredi et prières datées : analyse et compilation."""
+from array import array
+from datetime import date
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from custom_components.prayer_times.loader import CityCache
+from custom_components.prayer_times.pipeline import process_city
+from custom_components.prayer_times.special import compile_special, parse_events, parse_friday
+from custom_components.prayer_times.timetable import (
+    DAYS_PER_YEAR,
+    NO_TIME,
+    PRAYERS,
+    SPECIAL,
+    SPECIAL_INDEX,
+    RuleError,
+    day_index,
+)
+
+FRIDAY_HEADER = "slot,time,start,end,season\n"
+EVENTS_HEADER = "name,time,start,end\n"
+# Fajr 05:00, Shurouq 07:00, Dhuhr 13:00, Asr 16:00, Maghrib 19:00, Isha 23:30
+MINUTES = array("H", [300, 420, 780, 960, 1140, 1410]) * DAYS_PER_YEAR
+
+
+def special_at(special, day, name):
+    return special[day_index(day) * len(SPECIAL) + SPECIAL_INDEX[name]]
+
+
+def test_parse_friday():
+    assert parse_friday("13:00\n") == ((SPECIAL_INDEX["Jumua"], 0, DAYS_PER_YEAR - 1, None, (None, 780)),)
+    rules = parse_friday(f"{FRIDAY_HEADER}1,13:00,,,\n2,Dhuhr+75,11-01,02-28,\n1,Dhuhr-10,,,summer\n")
+    assert [rule[0] for rule in rules] == [SPECIAL_INDEX["Jumua"], SPECIAL_INDEX["Jumua 2"], SPECIAL_INDEX["Jumua"]]
+    assert rules[1][1:] == (305, 58, None, (PRAYERS.index("Dhuhr"), 75))
+    assert rules[2][3:] == ("summer", (PRAYERS.index("Dhuhr"), -10))
+
+
+@pytest.mark.parametrize(
+    "row", ["1,-1:00,,,", "1,25:30,,,", "1,Dhuhr+1440,,,", "1,Dhuhr+abc,,,", "3,13:00,,,", "1,13:00,13-01,,", "1,13:00,,,spring"]
+)
+def test_invalid_friday_row_is_reported(row):
+    with pytest.raises(RuleError) as err:
+        parse_friday(f"{FRIDAY_HEADER}1,13:00,,,\n{row}\n")
+    assert err.value.line == 3
+
+
+def test_invalid_legacy_friday_time():
+    with pytest.raises(RuleError) as err:
+        parse_friday("24:00\n")
+    assert err.value.line == 1
+
+
+def test_parse_events():
+    rules = parse_events(f"{EVENTS_HEADER}Eid,08:30,2026-03-20,\nTaraweeh,Isha+15,2026-02-18,2026-03-19\n")
+    assert rules == (
+        (SPECIAL_INDEX["Eid"], date(2026, 3, 20).toordinal(), date(2026, 3, 20).toordinal(), (None, 510)),
+        (
+            SPECIAL_INDEX["Taraweeh"],
+            date(2026, 2, 18).toordinal(),
+            date(2026, 3, 19).toordinal(),
+            (PRAYERS.index("Isha"), 15),
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "row", ["Eid,8:75,2026-03-20,", "Eid,08:30,2026-02-30,", "Mawlid,08:30,2026-03-20,", "Taraweeh,Isha+,2026-02-18,"]
+)
+def test_invalid_event_row_is_reported(row):
+    with pytest.raises(RuleError) as err:
+        parse_events(f"{EVENTS_HEADER}Eid,08:30,2026-03-20,\n{row}\n")
+    assert err.value.line == 3
+
+
+def test_compile_special():
+    friday = parse_friday(f"{FRIDAY_HEADER}1,13:00,,,\n1,Dhuhr+30,,,summer\n2,Isha+45,,,\n")
+    events = parse_events(f"{EVENTS_HEADER}Eid,08:30,2025-12-31,2026-01-01\nTaraweeh,Isha+15,2026-02-18,2026-03-19\n")
+    special, year = compile_special(MINUTES, friday, events, 2026, ZoneInfo("Europe/Paris"))
+
+    assert year == 2026
+    # Heure d'hiver : l'heure fixe ; heure d'été : Dhuhr + 30
+    assert special_at(special, date(2026, 1, 9), "Jumua") == 780
+    assert special_at(special, date(2026, 7, 10), "Jumua") == 810
+    # Isha + 45 passe minuit : pas d'horaire plutôt qu'une heure fausse
+    assert special_at(special, date(2026, 7, 10), "Jumua 2") == NO_TIME
+    # Seules les dates de 2026 sont retenues
+    assert special_at(special, date(2026, 1, 1), "Eid") == 510
+    assert special_at(special, date(2026, 12, 31), "Eid") == NO_TIME
+    assert special_at(special, date(2026, 3, 1), "Taraweeh") == 1425
+    assert special_at(special, date(2026, 3, 20), "Taraweeh") == NO_TIME
+
+    _, year = compile_special(MINUTES, friday, (), 2026)
+    assert year is None
+
+
+def test_invalid_friday_skips_only_its_rules(data_dir):
+    with open(f"{data_dir}/oissel/vendredi.csv", "w", encoding="utf-8") as file:
+        file.write(f"{FRIDAY_HEADER}1,-1:00,,,\n")
+
+    cities = CityCache(data_dir).load_all()
+
+    assert cities["oissel"].timetable.has_iqama()
+    assert cities["oissel"].timetable.special_names() == ()
+    assert cities["dar"].timetable.special_names() == ("Jumua",)
+    _, _, errors = process_city(f"{data_dir}/oissel")
+    assert errors == [f"{data_dir}/oissel/vendredi.csv:2: heure invalide : '-1:00'"]